@@ -0,0 +1,64 @@
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+logger = logging.getLogger('yatube.db')
+
+LOCK_RETRIES: int = 5
+LOCK_RETRY_DELAY: float = 0.05
+MAX_RETRY_DELAY: float = 1.0
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite по SQLITE_PRAGMAS.
+
+    journal_mode=WAL хранится в самом файле базы, остальные прагмы
+    действуют только на соединение, поэтому выполняются каждый раз.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return 'database is locked' in str(error)
+
+
+def retry_on_locked(func=None, *, using=None, attempts=LOCK_RETRIES,
+                    delay=LOCK_RETRY_DELAY):
+    """Выполняет функцию в транзакции и повторяет её при блокировке SQLite.
+
+    Транзакция, начатая чтением, в WAL не может дождаться блокировки
+    на запись и сразу получает «database is locked»: тогда она целиком
+    откатывается и запускается снова с растущей паузой. Внутри внешней
+    транзакции повтор невозможен, и ошибка пробрасывается.
+
+    Оборачивайте только сам блок записи, а не представление целиком:
+    блокировка держится до конца транзакции, и рендеринг шаблона
+    внутри неё задерживал бы остальных писателей.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nested = connections[using or DEFAULT_DB_ALIAS].in_atomic_block
+            for attempt in range(1, attempts + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        return func(*args, **kwargs)
+                except OperationalError as error:
+                    if nested or attempt == attempts or not is_locked(error):
+                        raise
+                    logger.info('База заблокирована, попытка %s из %s',
+                                attempt, attempts)
+                pause = min(delay * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+                time.sleep(pause * random.uniform(1, 2))
+        return wrapper
+    return decorator if func is None else decorator(func)
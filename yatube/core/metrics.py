@@ -0,0 +1,190 @@
+import threading
+import time
+
+# Границы корзин гистограммы в миллисекундах; последняя — «больше».
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+WINDOW_SECONDS: int = 300
+UNRESOLVED = '<unresolved>'
+
+_local = threading.local()
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: запись за O(корзин)."""
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        index = 0
+        while index < len(BUCKETS_MS) and value > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, rank):
+        """Верхняя граница корзины, в которую попадает перцентиль."""
+        if not self.count:
+            return 0
+        threshold = rank / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                break
+        return BUCKETS_MS[index] if index < len(BUCKETS_MS) else float('inf')
+
+
+class ViewMetrics:
+    __slots__ = ('total', 'db_ms', 'queries', 'template_ms', 'errors')
+
+    def __init__(self):
+        self.total = Histogram()
+        self.db_ms = 0.0
+        self.queries = 0
+        self.template_ms = 0.0
+        self.errors = 0
+
+    def merge(self, other):
+        self.total.merge(other.total)
+        self.db_ms += other.db_ms
+        self.queries += other.queries
+        self.template_ms += other.template_ms
+        self.errors += other.errors
+
+
+class MetricsRegistry:
+    """Скользящие метрики по представлениям в памяти процесса.
+
+    Данные копятся в текущем окне; по истечении окна оно становится
+    предыдущим, а снимок объединяет оба — это последние 5–10 минут.
+    """
+
+    def __init__(self, window=WINDOW_SECONDS):
+        self.window = window
+        self._lock = threading.Lock()
+        self._current = {}
+        self._previous = {}
+        self._started = time.monotonic()
+
+    def _rotate(self, now):
+        elapsed = now - self._started
+        if elapsed < self.window:
+            return
+        self._previous = self._current if elapsed < 2 * self.window else {}
+        self._current = {}
+        self._started = now
+
+    def record(self, view, total_ms, db_ms, queries, template_ms, status):
+        with self._lock:
+            self._rotate(time.monotonic())
+            metrics = self._current.get(view)
+            if metrics is None:
+                metrics = self._current[view] = ViewMetrics()
+            metrics.total.add(total_ms)
+            metrics.db_ms += db_ms
+            metrics.queries += queries
+            metrics.template_ms += template_ms
+            if status >= 500:
+                metrics.errors += 1
+
+    def snapshot(self):
+        """Сводка по представлениям, самые нагруженные сверху."""
+        merged = {}
+        with self._lock:
+            self._rotate(time.monotonic())
+            for window in (self._previous, self._current):
+                for view, metrics in window.items():
+                    merged.setdefault(view, ViewMetrics()).merge(metrics)
+        rows = []
+        for view, metrics in merged.items():
+            count = metrics.total.count
+            rows.append({
+                'view': view,
+                'requests': count,
+                'errors': metrics.errors,
+                'avg_ms': round(metrics.total.total / count, 2),
+                'p50_ms': metrics.total.percentile(50),
+                'p95_ms': metrics.total.percentile(95),
+                'p99_ms': metrics.total.percentile(99),
+                'avg_queries': round(metrics.queries / count, 1),
+                'avg_db_ms': round(metrics.db_ms / count, 2),
+                'avg_template_ms': round(metrics.template_ms / count, 2),
+            })
+        rows.sort(key=lambda row: row['avg_ms'] * row['requests'],
+                  reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._current = {}
+            self._previous = {}
+            self._started = time.monotonic()
+
+
+registry = MetricsRegistry()
+
+
+class RequestTimer:
+    """Счётчик запросов к БД для connection.execute_wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def start_template_timer():
+    _local.template_seconds = 0.0
+    _local.depth = 0
+
+
+def stop_template_timer():
+    seconds = getattr(_local, 'template_seconds', 0.0)
+    _local.depth = None
+    return seconds
+
+
+def install_template_timer():
+    """Оборачивает рендер шаблонов Django для учёта его времени.
+
+    Учитываются только внешние вызовы: вложенный рендер уже входит
+    во время внешнего. Вне замеряемого запроса обёртка ничего не делает.
+    """
+    from django.template.backends.django import Template
+    if getattr(Template.render, 'timed', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        depth = getattr(_local, 'depth', None)
+        if depth is None:
+            return original(self, context, request)
+        _local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            _local.depth = depth
+            if depth == 0:
+                _local.template_seconds += time.perf_counter() - started
+
+    render.timed = True
+    Template.render = render
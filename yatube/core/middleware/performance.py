@@ -0,0 +1,48 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from core.metrics import (UNRESOLVED, RequestTimer, install_template_timer,
+                          registry, start_template_timer,
+                          stop_template_timer)
+
+
+class PerformanceMiddleware:
+    """Замеряет каждый запрос: представление, число и время SQL,
+    время рендеринга шаблонов и общее время.
+
+    Итоги копятся в core.metrics.registry и отдаются заголовком
+    Server-Timing. Подключайте первым в MIDDLEWARE, чтобы общее время
+    включало остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+        timer = RequestTimer()
+        started = time.perf_counter()
+        start_template_timer()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            template_seconds = stop_template_timer()
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = timer.db_seconds * 1000
+        template_ms = template_seconds * 1000
+        match = getattr(request, 'resolver_match', None)
+        registry.record(
+            match.view_name if match else UNRESOLVED,
+            total_ms, db_ms, timer.queries, template_ms,
+            response.status_code,
+        )
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{timer.queries} queries", '
+            f'tpl;dur={template_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+        return response
@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from core import routers
+
+STICKY_COOKIE = 'use_primary'
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплик для представлений с @replica_reads.
+
+    Запрос, который что-то записал, ставит на REPLICA_STICKY_SECONDS
+    cookie: пока она жива, браузер читает с основной базы и видит
+    свои изменения, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request()
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(
+                    STICKY_COOKIE, '1',
+                    max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 15),
+                    httponly=True, samesite='Lax')
+            return response
+        finally:
+            routers.start_request()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in ('GET', 'HEAD') \
+                and getattr(view_func, 'replica_reads', False) \
+                and STICKY_COOKIE not in request.COOKIES:
+            routers.use_replica()
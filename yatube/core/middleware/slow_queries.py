@@ -0,0 +1,33 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core.metrics import UNRESOLVED
+from core.slow_queries import SlowQueryWrapper
+
+
+class SlowQueryMiddleware:
+    """Журнал медленных SQL-запросов с планом выполнения.
+
+    Включается настройкой SLOW_QUERY_MS — порогом в миллисекундах;
+    при None middleware отключается и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        self.threshold_ms = getattr(settings, 'SLOW_QUERY_MS', None)
+        if self.threshold_ms is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        def view_name():
+            match = getattr(request, 'resolver_match', None)
+            return match.view_name if match else UNRESOLVED
+
+        wrapper = SlowQueryWrapper(self.threshold_ms, view_name)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
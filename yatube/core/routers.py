@@ -0,0 +1,55 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def replica_reads(view):
+    """Помечает представление только для чтения: его запросы GET и HEAD
+    ReplicaMiddleware направляет на реплики.
+    """
+    view.replica_reads = True
+    return view
+
+
+def start_request():
+    _state.replica = False
+    _state.wrote = False
+
+
+def use_replica():
+    _state.replica = True
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Чтение в помеченных представлениях — с реплик, запись — в основную.
+
+    Вне таких запросов (команды, записи, запросы после записи) всё
+    идёт в основную базу. Список реплик — настройка DATABASE_REPLICAS.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if replicas and getattr(_state, 'replica', False):
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # После записи и до конца запроса читаем свои же изменения.
+        _state.wrote = True
+        _state.replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS,
+                     *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.slow_queries')
+
+# Сколько разных форм запросов помнить и сколько кадров стека писать.
+MAX_FINGERPRINTS: int = 500
+STACK_DEPTH: int = 6
+# Параметры пишутся в журнал и на страницу статистики: у запросов
+# к сессиям и пользователям там ключи сессий и хеши паролей.
+SENSITIVE_TABLES = ('django_session', 'auth_user')
+MAX_PARAM_LENGTH: int = 80
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """Отпечаток формы запроса: без литералов и длины списков IN."""
+    shape = sql.replace('%s', '?')
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape)
+    shape = _SPACES.sub(' ', shape).strip()
+    return hashlib.md5(shape.encode()).hexdigest()[:12], shape
+
+
+def project_stack():
+    """Кадры стека из кода проекта — без Django и самого журнала."""
+    frames = [
+        f'{frame.filename[len(settings.BASE_DIR) + 1:]}:{frame.lineno} '
+        f'in {frame.name}'
+        for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(settings.BASE_DIR)
+        and frame.filename != __file__
+        and '/site-packages/' not in frame.filename
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+def explain(connection, sql, params):
+    """План запроса; в журнал не попадает и ошибок не бросает."""
+    prefix = ('EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+              else 'EXPLAIN')
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(str(col) for col in row)
+                    for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        _local.explaining = False
+
+
+def safe_params(sql, params):
+    """Параметры для журнала: скрытые для чувствительных таблиц,
+    длинные значения обрезаны.
+    """
+    if any(table in sql for table in SENSITIVE_TABLES):
+        return '<скрыты>'
+    if params is None:
+        return repr(params)
+    shown = []
+    for param in params:
+        text = repr(param)
+        if len(text) > MAX_PARAM_LENGTH:
+            text = text[:MAX_PARAM_LENGTH] + '…'
+        shown.append(text)
+    return '(' + ', '.join(shown) + ')'
+
+
+class SlowQueryLog:
+    """Группирует медленные запросы по отпечатку.
+
+    Первое появление формы пишется в журнал целиком — с SQL,
+    параметрами, представлением, стеком и планом. Повторы только
+    считаются и напоминают о себе на 2-м, 4-м, 8-м… разе.
+    """
+
+    def __init__(self, max_fingerprints=MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def record(self, connection, sql, params, duration_ms, view):
+        key, shape = fingerprint(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                count = self._repeat(key, entry, duration_ms, {view})
+        if entry is not None:
+            self._log_repeat(key, entry, count, shape)
+            return
+        entry = {
+            'fingerprint': key,
+            'shape': shape,
+            'sql': sql,
+            'params': safe_params(sql, params),
+            'count': 1,
+            'total_ms': duration_ms,
+            'max_ms': duration_ms,
+            'views': {view},
+            'stack': project_stack(),
+            'plan': (explain(connection, sql, params)
+                     if sql.lstrip()[:6].upper() == 'SELECT' else []),
+        }
+        with self._lock:
+            # Пока снимался план, ту же форму мог записать другой поток:
+            # тогда добавляем наш запрос к его записи, а не затираем её.
+            existing = self._entries.get(key)
+            if existing is not None:
+                count = self._repeat(
+                    key, existing, duration_ms, entry['views'])
+            else:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_fingerprints:
+                    self._entries.popitem(last=False)
+        if existing is not None:
+            self._log_repeat(key, existing, count, shape)
+            return
+        logger.warning(
+            'Медленный запрос %s (%.1f мс) в %s\n%s\nПараметры: %s\n'
+            'Стек:\n  %s\nПлан:\n  %s',
+            key, duration_ms, view, sql, entry['params'],
+            '\n  '.join(entry['stack']), '\n  '.join(entry['plan']),
+        )
+
+    def _repeat(self, key, entry, duration_ms, views):
+        """Учитывает повтор формы; вызывается под блокировкой."""
+        self._entries.move_to_end(key)
+        entry['count'] += 1
+        entry['total_ms'] += duration_ms
+        entry['max_ms'] = max(entry['max_ms'], duration_ms)
+        entry['views'].update(views)
+        return entry['count']
+
+    def _log_repeat(self, key, entry, count, shape):
+        if count & (count - 1) == 0:
+            logger.warning(
+                'Медленный запрос %s повторился %s раз, '
+                'максимум %.1f мс: %s',
+                key, count, entry['max_ms'], shape,
+            )
+
+    def snapshot(self):
+        """Формы запросов, самые затратные сверху."""
+        with self._lock:
+            rows = [
+                dict(entry, views=sorted(entry['views']))
+                for entry in self._entries.values()
+            ]
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_log = SlowQueryLog()
+
+
+class SlowQueryWrapper:
+    """execute_wrapper, передающий в журнал запросы дольше порога."""
+
+    def __init__(self, threshold_ms, view_name, log=slow_log):
+        self.threshold_ms = threshold_ms
+        self.view_name = view_name
+        self.log = log
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= self.threshold_ms and not many:
+                self.log.record(
+                    context['connection'], sql, params, duration_ms,
+                    self.view_name(),
+                )
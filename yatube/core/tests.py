@@ -0,0 +1,421 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.db import retry_on_locked
+from core.lru import LRUCache
+from core.metrics import Histogram, MetricsRegistry, registry
+from core.middleware.replicas import STICKY_COOKIE
+from core.routers import ReplicaRouter
+from core.slow_queries import SlowQueryLog, fingerprint, slow_log
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class HistogramTest(TestCase):
+    def test_percentile_returns_bucket_bound(self):
+        """Перцентиль — верхняя граница корзины."""
+        histogram = Histogram()
+        for value in (0.5, 3, 3, 3, 40, 40, 40, 40, 40, 700):
+            histogram.add(value)
+        self.assertEqual(histogram.count, 10)
+        self.assertEqual(histogram.percentile(50), 50)
+        self.assertEqual(histogram.percentile(99), 1000)
+        self.assertEqual(Histogram().percentile(50), 0)
+
+    def test_registry_forgets_old_windows(self):
+        """Данные старше двух окон выпадают из снимка."""
+        metrics = MetricsRegistry(window=0)
+        metrics.record('posts:index', 10, 1, 2, 3, 200)
+        self.assertEqual(metrics.snapshot(), [])
+        metrics = MetricsRegistry(window=60)
+        metrics.record('posts:index', 10, 1, 2, 3, 500)
+        row, = metrics.snapshot()
+        self.assertEqual(row['requests'], 1)
+        self.assertEqual(row['errors'], 1)
+        self.assertEqual(row['avg_queries'], 2)
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_eviction_by_size_and_ttl(self):
+        """Давно не читанные записи вытесняются, старые истекают."""
+        lru = LRUCache('test', max_bytes=10, ttl=60)
+        lru.set('a', 1, 4)
+        lru.set('b', 2, 4)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3, 4)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+        lru.set('huge', 4, 11)
+        self.assertIsNone(lru.get('huge'))
+        stats = lru.stats()
+        self.assertEqual(stats['bytes'], 8)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+        with mock.patch('core.lru.time.monotonic', return_value=1e12):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.stats()['expirations'], 1)
+
+    def test_thread_safety(self):
+        """Параллельные записи не ломают учёт размера."""
+        lru = LRUCache('test', max_bytes=100, ttl=60)
+
+        def work(offset):
+            for number in range(1000):
+                lru.set((offset, number % 50), number, 3)
+                lru.get((offset, (number * 7) % 50))
+                lru.delete((offset, (number * 3) % 50))
+        threads = [threading.Thread(target=work, args=(offset,))
+                   for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = lru.stats()
+        self.assertLessEqual(stats['bytes'], 100)
+        self.assertEqual(stats['bytes'], stats['entries'] * 3)
+
+
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_request_is_recorded(self):
+        """Запрос попадает в метрики с SQL и временем шаблонов."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('Server-Timing', response)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        row, = registry.snapshot()
+        self.assertEqual(row['view'], 'posts:index')
+        self.assertEqual(row['requests'], 1)
+        self.assertGreater(row['avg_queries'], 0)
+        self.assertGreater(row['avg_template_ms'], 0)
+
+    def test_unresolved_requests_are_grouped(self):
+        """Несуществующие адреса не раздувают список представлений."""
+        self.client.get('/nope/1/')
+        self.client.get('/nope/2/')
+        row, = registry.snapshot()
+        self.assertEqual(row['view'], '<unresolved>')
+        self.assertEqual(row['requests'], 2)
+
+    def test_stats_page_is_staff_only(self):
+        """Страница метрик доступна только персоналу."""
+        url = reverse('core:performance')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.get(reverse('posts:index'))
+        response = self.staff_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'posts:index')
+        response = self.staff_client.get(url, {'format': 'json'})
+        views = [row['view'] for row in response.json()['views']]
+        self.assertIn('posts:index', views)
+
+
+@override_settings(SLOW_QUERY_MS=0)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        slow_log.reset()
+
+    def test_fingerprint_ignores_literals(self):
+        """Запросы одной формы получают один отпечаток."""
+        first, _ = fingerprint("SELECT * FROM t WHERE id IN (%s, %s)")
+        second, _ = fingerprint("SELECT * FROM t WHERE id IN (%s)")
+        third, _ = fingerprint("SELECT * FROM t WHERE name = 'x' AND n = 5")
+        fourth, _ = fingerprint("SELECT * FROM t WHERE name = 'y' AND n = 7")
+        self.assertEqual(first, second)
+        self.assertEqual(third, fourth)
+        self.assertNotEqual(first, third)
+
+    def test_slow_queries_are_grouped_with_plan(self):
+        """Повторы не плодят записи, план снимается один раз."""
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            Client().get(reverse('posts:post_detail', args=[self.post.id]))
+            cache.clear()
+            Client().get(reverse('posts:post_detail', args=[self.post.id]))
+        entries = slow_log.snapshot()
+        fingerprints = [entry['fingerprint'] for entry in entries]
+        self.assertEqual(len(fingerprints), len(set(fingerprints)))
+        self.assertTrue(all(entry['count'] == 2 for entry in entries))
+        # Загрузка самого поста (а не строка для ETag) идёт из views.py.
+        entry = next(entry for entry in entries
+                     if '"posts_post"."text"' in entry['sql'])
+        self.assertEqual(entry['views'], ['posts:post_detail'])
+        self.assertTrue(entry['plan'])
+        self.assertTrue(any('posts/views.py' in frame
+                            for frame in entry['stack']))
+        self.assertFalse(any('EXPLAIN' in entry['sql'] for entry in entries))
+        self.assertIn('повторился 2 раз', logs.output[-1])
+
+    def test_sensitive_params_are_hidden(self):
+        """Параметры запросов к сессиям и пользователям не сохраняются."""
+        log = SlowQueryLog()
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            log.record(connection, 'UPDATE "auth_user" SET "password" = %s',
+                       ['pbkdf2_sha256$secret'], 10, 'admin')
+            log.record(connection, 'SELECT %s', ['x' * 1000], 10, 'index')
+        entries = {entry['views'][0]: entry for entry in log.snapshot()}
+        self.assertEqual(entries['admin']['params'], '<скрыты>')
+        self.assertLess(len(entries['index']['params']), 100)
+        self.assertNotIn('secret', ''.join(logs.output))
+
+    def test_concurrent_first_records_are_merged(self):
+        """Два потока с новой формой запроса не затирают друг друга."""
+        log = SlowQueryLog()
+        barrier = threading.Barrier(2)
+
+        def slow_explain(*args):
+            barrier.wait(timeout=5)
+            return ['plan']
+
+        def record(view):
+            log.record(connection, 'SELECT 1', [], 10, view)
+
+        with mock.patch('core.slow_queries.explain', slow_explain), \
+                self.assertLogs('yatube.slow_queries', 'WARNING'):
+            threads = [threading.Thread(target=record, args=(view,))
+                       for view in ('index', 'profile')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        entry, = log.snapshot()
+        self.assertEqual(entry['count'], 2)
+        self.assertEqual(entry['views'], ['index', 'profile'])
+
+
+@override_settings(SQLITE_PRAGMAS=settings.SQLITE_PRODUCTION_PRAGMAS)
+class SQLiteConcurrencyTest(SimpleTestCase):
+    """Читатели и писатели одновременно работают с файлом базы."""
+    alias = 'stress'
+    WRITERS = 4
+    READERS = 4
+    WRITES = 25
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        connections.databases[self.alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'stress.sqlite3'),
+            'OPTIONS': {'timeout': 1},
+        }
+        connections.ensure_defaults(self.alias)
+        connections.prepare_test_settings(self.alias)
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE counter (id INTEGER PRIMARY KEY, value INT)')
+
+    def tearDown(self):
+        connections[self.alias].close()
+        del connections.databases[self.alias]
+        shutil.rmtree(self.directory)
+
+    def run_thread(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception as error:
+                self.errors.append(error)
+            finally:
+                connections[self.alias].close()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def write(self):
+        with connections[self.alias].cursor() as cursor:
+            # Чтение перед записью: самый конфликтный случай в SQLite.
+            cursor.execute('SELECT COUNT(*) FROM counter')
+            value = cursor.fetchone()[0]
+            time.sleep(0.001)
+            cursor.execute(
+                'INSERT INTO counter (value) VALUES (%s)', [value])
+
+    def writer(self):
+        write = retry_on_locked(
+            self.write, using=self.alias, attempts=10, delay=0.01)
+        for _ in range(self.WRITES):
+            write()
+
+    def reader(self, done):
+        while not done.is_set():
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM counter')
+                cursor.fetchone()
+
+    def test_readers_and_writers(self):
+        """WAL и повтор при блокировке: ни одной потерянной записи."""
+        self.errors = []
+        done = threading.Event()
+        writers = [self.run_thread(self.writer)
+                   for _ in range(self.WRITERS)]
+        readers = [self.run_thread(self.reader, done)
+                   for _ in range(self.READERS)]
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual(self.errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('SELECT COUNT(*), MAX(value) FROM counter')
+            total = self.WRITERS * self.WRITES
+            self.assertEqual(cursor.fetchone(), (total, total - 1))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    """Реплика в тесте — та же база под другим именем."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.replica_settings = connections.databases.get('replica')
+        connections.databases['replica'] = connections.databases['default']
+        connections['replica'] = connections['default']
+        self.aliases = []
+        original = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = original(router, model, **hints)
+            self.aliases.append(alias)
+            return alias
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def tearDown(self):
+        del connections['replica']
+        if self.replica_settings is None:
+            del connections.databases['replica']
+        else:
+            connections.databases['replica'] = self.replica_settings
+
+    def test_listing_views_read_from_replica(self):
+        """Ленты и страница поста читают с реплики."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                self.aliases.clear()
+                self.client.get(address)
+                self.assertTrue(self.aliases)
+                self.assertEqual(set(self.aliases), {'replica'})
+
+    def test_other_views_read_from_primary(self):
+        """Остальные представления и команды читают с основной базы."""
+        self.author_client.get(reverse('posts:post_create'))
+        Post.objects.count()
+        self.assertTrue(self.aliases)
+        self.assertEqual(set(self.aliases), {'default'})
+
+    def test_writer_sticks_to_primary(self):
+        """После записи автор читает с основной базы, пока жива cookie."""
+        response = self.author_client.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            data={'text': 'Отредактированный пост'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.aliases.clear()
+        self.author_client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        self.assertEqual(set(self.aliases), {'default'})
+        self.client.get(reverse('posts:index'))
+        self.assertNotIn(STICKY_COOKIE, self.client.cookies)
+
+    def freeze_replica(self):
+        """Реплика — снимок базы на этот момент, дальше она отстаёт."""
+        connections.databases['snapshot'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+        self.addCleanup(connections.databases.pop, 'snapshot')
+        connections.ensure_defaults('snapshot')
+        connections.prepare_test_settings('snapshot')
+        snapshot = connections['snapshot']
+        self.addCleanup(snapshot.close)
+        snapshot.ensure_connection()
+        connections['default'].ensure_connection()
+        # backup() ждал бы конца транзакции теста, а дамп видит её данные.
+        # Таблицы в дампе идут по алфавиту, поэтому внешние ключи
+        # на время загрузки выключены; полнотекстовый индекс не нужен.
+        dump = [
+            statement for statement
+            in connections['default'].connection.iterdump()
+            if 'posts_post_fts' not in statement
+        ]
+        snapshot.connection.executescript(
+            'PRAGMA foreign_keys = OFF;\n' + '\n'.join(dump))
+        connections['replica'] = snapshot
+
+    def test_stale_replica_does_not_refill_caches(self):
+        """Отставшая реплика не возвращает в кэши данные до правки."""
+        group = Group.objects.create(title='Группа', slug='old_slug')
+        address = reverse('posts:profile', args=[self.user.username])
+        self.client.get(address)
+        self.freeze_replica()
+        self.author_client.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            data={'text': 'Отредактированный пост'})
+        group.slug = 'new_slug'
+        group.save()
+        Group.objects.create(title='Новая группа', slug='old_slug_2')
+        self.aliases.clear()
+        self.client.get(address)
+        self.client.get(reverse('posts:group_list', args=['new_slug']))
+        self.client.get(reverse('posts:group_list', args=['old_slug_2']))
+        self.assertIn('replica', self.aliases)
+        # Реплика догнала основную базу: в кэше только свежие данные.
+        connections['replica'] = connections['default']
+        self.assertContains(
+            self.client.get(address + '?page=1'), 'Отредактированный пост')
+        self.assertContains(
+            self.client.get(reverse('posts:post_detail',
+                                    args=[self.post.id])),
+            'Отредактированный пост')
+        for slug in ('new_slug', 'old_slug_2'):
+            with self.subTest(slug=slug):
+                response = self.client.get(
+                    reverse('posts:group_list', args=[slug]))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
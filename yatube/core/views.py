@@ -0,0 +1,27 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .lru import caches
+from .metrics import WINDOW_SECONDS, registry
+from .slow_queries import slow_log
+
+
+@staff_member_required
+def performance(request):
+    rows = registry.snapshot()
+    slow_queries = slow_log.snapshot()
+    lru_stats = [lru.stats() for lru in caches]
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'views': rows,
+            'slow_queries': slow_queries,
+            'caches': lru_stats,
+        })
+    context = {
+        'rows': rows,
+        'caches': lru_stats,
+        'slow_queries': slow_queries,
+        'window_minutes': WINDOW_SECONDS // 60,
+    }
+    return render(request, 'core/performance.html', context)
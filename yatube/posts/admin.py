@@ -1,21 +1,88 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
 
-from .models import Post, Group
+from .bulk import delete_posts, move_posts
+from .models import Follow, Post, Group
+from .search import search_posts
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        label='Группа',
+        widget=AutocompleteSelect(
+            Post._meta.get_field('group').remote_field, admin.site),
+    )
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
-    list_editable = ('group',)
+    # Таблица постов большая: автор и группа подтягиваются в тот же
+    # запрос, выпадающие списки заменены поиском, а полное число
+    # записей без фильтров не считается.
+    list_display = ('pk', 'headline', 'pub_date', 'author', 'group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('move_to_group', 'delete_posts')
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('text')
+
+    def get_actions(self, request):
+        # Стандартное удаление загружает каждый пост ради сигналов.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_posts(queryset, search_term), False
+
+    def move_to_group(self, request, queryset):
+        try:
+            group = self.action_form.base_fields['group'].clean(
+                request.POST.get('group'))
+        except ValidationError:
+            self.message_user(request, 'Группа не найдена.', messages.ERROR)
+            return
+        moved = move_posts(queryset, group)
+        target = group.title if group else 'без группы'
+        self.message_user(
+            request, f'Перенесено записей: {moved} ({target}).',
+            messages.SUCCESS)
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def delete_posts(self, request, queryset):
+        deleted = delete_posts(queryset)
+        self.message_user(
+            request, f'Удалено записей: {deleted}.', messages.SUCCESS)
+    delete_posts.short_description = 'Удалить выбранные записи'
+    delete_posts.allowed_permissions = ('delete',)
+
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('title', 'slug', 'description',)
+    list_display = ('title', 'slug', 'description', 'posts_count',)
     search_fields = ('title', 'description',)
     empty_value_display = '-пусто-'
 
 
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('user', 'author', 'created',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+
+
+admin.site.register(Follow, FollowAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,209 @@
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .cache import cache_anonymous_page
+from .models import Group, Post, User
+from .utils import LIMIT_POSTS, keyset_slice, make_cursor, parse_cursor
+
+MAX_LIMIT: int = 100
+
+# Публичное имя поля -> путь для .values_list(): связанные поля
+# приходят тем же запросом через JOIN, модели не создаются.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'author_first_name': 'author__first_name',
+    'author_last_name': 'author__last_name',
+    'group': 'group__slug',
+    'group_title': 'group__title',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+    'posts_count': 'posts_count',
+    'posts_updated': 'posts_updated',
+}
+AUTHOR_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'posts_updated': 'stats__posts_updated',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def api_view(view):
+    """Только чтение, ответы и ошибки в JSON, кэш для анонимов."""
+    @require_safe
+    @cache_anonymous_page
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return JsonResponse(
+                view(request, *args, **kwargs),
+                json_dumps_params={'ensure_ascii': False},
+            )
+        except ApiError as error:
+            return JsonResponse({'detail': error.detail},
+                                status=error.status)
+    return wrapper
+
+
+def select_fields(request, available):
+    """Поля из ?fields=a,b; по умолчанию все доступные."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return dict(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return {name: available[name] for name in names}
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', LIMIT_POSTS))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def page_url(request, **params):
+    query = request.GET.copy()
+    for name in ('after', 'before'):
+        query.pop(name, None)
+    query.update(params)
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def fetch_rows(queryset, fields, keys):
+    """Строки .values_list() с ключами курсора впереди полей ответа."""
+    return queryset.values_list(*keys, *fields.values())
+
+
+def serialize(row, fields, keys):
+    return dict(zip(fields, row[len(keys):]))
+
+
+def post_page(request, queryset):
+    """Страница постов по курсору (pub_date, id) без COUNT и OFFSET."""
+    fields = select_fields(request, POST_FIELDS)
+    keys = ('pub_date', 'id')
+    before = request.GET.get('before')
+    after = request.GET.get('after')
+    rows, has_more = keyset_slice(
+        fetch_rows(queryset, fields, keys),
+        after=after, before=before, limit=get_limit(request))
+    if parse_cursor(before) is not None:
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, parse_cursor(after) is not None
+    next_url = previous_url = None
+    if rows and has_next:
+        next_url = page_url(request, after=make_cursor(*rows[-1][:2]))
+    if rows and has_previous:
+        previous_url = page_url(request, before=make_cursor(*rows[0][:2]))
+    return {
+        'results': [serialize(row, fields, keys) for row in rows],
+        'next': next_url,
+        'previous': previous_url,
+    }
+
+
+def id_page(request, queryset, fields):
+    """Страница справочника по возрастанию id, курсор — последний id."""
+    limit = get_limit(request)
+    after = request.GET.get('after')
+    if after:
+        try:
+            queryset = queryset.filter(id__gt=int(after))
+        except ValueError:
+            raise ApiError('after должен быть числом')
+    keys = ('id',)
+    rows = list(fetch_rows(queryset.order_by('id'), fields, keys)[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = page_url(request, after=rows[-1][0])
+    return {
+        'results': [serialize(row, fields, keys) for row in rows],
+        'next': next_url,
+    }
+
+
+def get_row(queryset, fields, **lookup):
+    row = queryset.filter(**lookup).values_list(*fields.values()).first()
+    if row is None:
+        raise ApiError('Не найдено', status=404)
+    return serialize(row, fields, ())
+
+
+@api_view
+def post_list(request):
+    """Лента постов, фильтры ?group=<slug> и ?author=<username>."""
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return post_page(request, queryset)
+
+
+@api_view
+def post_detail(request, post_id):
+    return get_row(Post.objects.all(), select_fields(request, POST_FIELDS),
+                   pk=post_id)
+
+
+@api_view
+def group_list(request):
+    return id_page(request, Group.objects.all(),
+                   select_fields(request, GROUP_FIELDS))
+
+
+@api_view
+def group_detail(request, slug):
+    return get_row(Group.objects.all(), select_fields(request, GROUP_FIELDS),
+                   slug=slug)
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = get_row(Group.objects.all(), {'id': 'id'}, slug=slug)['id']
+    return post_page(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view
+def author_list(request):
+    return id_page(request, User.objects.filter(is_active=True),
+                   select_fields(request, AUTHOR_FIELDS))
+
+
+@api_view
+def author_detail(request, username):
+    return get_row(User.objects.filter(is_active=True),
+                   select_fields(request, AUTHOR_FIELDS),
+                   username=username)
+
+
+@api_view
+def author_posts(request, username):
+    author_id = get_row(User.objects.filter(is_active=True), {'id': 'id'},
+                        username=username)['id']
+    return post_page(request, Post.objects.filter(author_id=author_id))
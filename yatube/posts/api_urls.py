@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.post_list, name='post_list'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path('groups/', api.group_list, name='group_list'),
+    path('groups/<slug:slug>/', api.group_detail, name='group_detail'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('authors/', api.author_list, name='author_list'),
+    path('authors/<str:username>/', api.author_detail,
+         name='author_detail'),
+    path('authors/<str:username>/posts/', api.author_posts,
+         name='author_posts'),
+]
@@ -0,0 +1,180 @@
+import math
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import resolve, reverse
+
+from .models import AuthorStats, Group, Post
+from .utils import LIMIT_POSTS
+
+PERCENTILES = (50, 95, 99)
+# Насколько может вырасти метрика, прежде чем это считается регрессией.
+DEFAULT_THRESHOLD: float = 0.2
+
+
+def percentile(values, rank):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(math.ceil(rank / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class Scenario:
+    """Один запрос к представлению; method='post' выполняется в
+    транзакции с откатом, чтобы замеры не меняли данные.
+    """
+
+    def __init__(self, name, url, method='get', data=None,
+                 login_required=False):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data
+        self.login_required = login_required
+
+    def run(self, client):
+        if self.method == 'get':
+            return client.get(self.url)
+        with transaction.atomic():
+            response = client.post(self.url, self.data)
+            transaction.set_rollback(True)
+        return response
+
+
+def build_scenarios(depths):
+    """Сценарии для всех лент на нескольких глубинах страниц."""
+    post = Post.objects.order_by('-pub_date', '-id').first()
+    if post is None:
+        raise ValueError('База пуста: сначала запустите manage.py seed.')
+    group = Group.objects.order_by('-posts_count').first()
+    stats = AuthorStats.objects.select_related('author').order_by(
+        '-posts_count').first()
+    author = stats.author if stats is not None else post.author
+    listings = [('index', reverse('posts:index'))]
+    if group is not None:
+        listings.append(('group_posts', reverse(
+            'posts:group_list', kwargs={'slug': group.slug})))
+    listings.append(('profile', reverse(
+        'posts:profile', kwargs={'username': author.username})))
+    scenarios = []
+    for name, url in listings:
+        for depth in depths:
+            scenarios.append(Scenario(f'{name}?page={depth}',
+                                      f'{url}?page={depth}'))
+            cursor = keyset_cursor(url, depth)
+            if cursor:
+                scenarios.append(Scenario(f'{name}?after@{depth}',
+                                          f'{url}?after={cursor}'))
+    own_post = author.posts.order_by('-pub_date', '-id').first()
+    detail_url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+    edit_url = reverse('posts:post_edit', kwargs={'post_id': own_post.id})
+    create_url = reverse('posts:post_create')
+    data = {'text': 'Запись, созданная при замере производительности'}
+    scenarios += [
+        Scenario('post_detail', detail_url),
+        Scenario('post_create:get', create_url, login_required=True),
+        Scenario('post_create:post', create_url, 'post', data,
+                 login_required=True),
+        Scenario('post_edit:get', edit_url, login_required=True),
+        Scenario('post_edit:post', edit_url, 'post', data,
+                 login_required=True),
+    ]
+    return scenarios, author
+
+
+def keyset_cursor(url, depth):
+    """Курсор, ведущий на ту же глубину, что и ?page=depth."""
+    match = resolve(url)
+    queryset = Post.objects.all()
+    if 'slug' in match.kwargs:
+        queryset = queryset.filter(group__slug=match.kwargs['slug'])
+    if 'username' in match.kwargs:
+        queryset = queryset.filter(author__username=match.kwargs['username'])
+    offset = (depth - 1) * LIMIT_POSTS - 1
+    if offset < 0:
+        return None
+    post = queryset.order_by('-pub_date', '-id')[offset:offset + 1].first()
+    return post.cursor if post else None
+
+
+class QueryTimer:
+    """Считает запросы и их время через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def measure(scenario, client, repeat, cold_cache):
+    latencies, queries, sql_times = [], [], []
+    for _ in range(repeat):
+        if cold_cache:
+            cache.clear()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = scenario.run(client)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(timer.count)
+        sql_times.append(timer.seconds * 1000)
+    result = {
+        f'p{rank}_ms': round(percentile(latencies, rank), 3)
+        for rank in PERCENTILES
+    }
+    result.update({
+        'status': response.status_code,
+        'queries': percentile(queries, 50),
+        'sql_ms': round(percentile(sql_times, 50), 3),
+    })
+    return result
+
+
+def run_benchmarks(depths=(1, 10, 100), repeat=20, cold_cache=False,
+                   anonymous=False):
+    scenarios, author = build_scenarios(depths)
+    client = Client()
+    if not anonymous:
+        client.force_login(author)
+    results = {
+        scenario.name: measure(scenario, client, repeat, cold_cache)
+        for scenario in scenarios
+        if not (anonymous and scenario.login_required)
+    }
+    return {
+        'meta': {
+            'posts': Post.objects.count(),
+            'repeat': repeat,
+            'cold_cache': cold_cache,
+            'anonymous': anonymous,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(base, current, threshold=DEFAULT_THRESHOLD):
+    """Сравнивает два прогона, возвращает список регрессий."""
+    regressions = []
+    for name, new in current['results'].items():
+        old = base['results'].get(name)
+        if old is None:
+            continue
+        if new['queries'] > old['queries']:
+            regressions.append(
+                f'{name}: запросов {old["queries"]} -> {new["queries"]}')
+        for metric in ('p95_ms', 'sql_ms'):
+            # Доли миллисекунды — шум, их не сравниваем.
+            if new[metric] > max(old[metric], 1) * (1 + threshold):
+                regressions.append(
+                    f'{name}: {metric} {old[metric]} -> {new[metric]}')
+    return regressions
@@ -0,0 +1,104 @@
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from . import counters, timeline
+from .cache import bump_generation, invalidate_post_details
+from .models import AuthorStats, Post, TimelineEntry
+from .search import index_posts, unindex_posts
+
+# Сколько id передавать в одном DELETE ... WHERE id IN (...).
+DELETE_BATCH: int = 500
+
+
+def affected(queryset):
+    """id постов выборки и затронутые ими авторы и группы."""
+    rows = list(queryset.order_by().values_list('pk', 'author_id',
+                                                'group_id'))
+    post_ids = [pk for pk, _, _ in rows]
+    author_ids = {author_id for _, author_id, _ in rows}
+    group_ids = {group_id for _, _, group_id in rows} - {None}
+    return post_ids, author_ids, group_ids
+
+
+def create_posts(posts, using=DEFAULT_DB_ALIAS):
+    """Вставляет посты bulk_create, индексирует их и раскладывает по лентам.
+
+    bulk_create не вызывает save() и сигналы, а в SQLite не возвращает
+    ключи. Внутри транзакции SQLite держит блокировку записи, поэтому
+    id вставленных строк идут подряд и заканчиваются last_insert_rowid:
+    чужие вставки в это время в пачку не попадут.
+    Счётчики и кэш вызывающий код пересчитывает сам, после всех пачек.
+    """
+    with transaction.atomic(using=using):
+        Post.objects.using(using).bulk_create(posts)
+        if posts and posts[-1].pk is None:
+            with connections[using].cursor() as cursor:
+                cursor.execute('SELECT last_insert_rowid()')
+                last_id = cursor.fetchone()[0]
+            for pk, post in enumerate(posts, start=last_id - len(posts) + 1):
+                post.pk = pk
+        index_posts(posts, using=using)
+        timeline.fan_out_posts(posts)
+    return posts
+
+
+def move_posts(queryset, group):
+    """Переносит посты выборки в группу (или из групп) одним UPDATE.
+
+    Сигналы при этом не срабатывают, поэтому счётчики групп
+    пересчитываются, а кэш страниц сбрасывается здесь. Ключи карточек
+    меняются сами вместе с updated.
+    """
+    with transaction.atomic():
+        post_ids, author_ids, group_ids = affected(queryset)
+        if not post_ids:
+            return 0
+        now = timezone.now()
+        moved = queryset.order_by().update(group=group, updated=now)
+        if group is not None:
+            group_ids.add(group.pk)
+        counters.recount_groups(group_ids)
+        # Карточки в профилях показывают группу: меняем время правки
+        # постов у авторов, чтобы сменился ETag их страниц.
+        AuthorStats.objects.filter(author_id__in=author_ids).update(
+            posts_updated=now)
+    invalidate_post_details(post_ids)
+    bump_generation()
+    return moved
+
+
+def raw_delete_posts(post_ids, using):
+    """DELETE по списку id в обход Collector и сигналов."""
+    connection = connections[using]
+    table = connection.ops.quote_name(Post._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ({placeholders})', post_ids)
+        return cursor.rowcount
+
+
+def delete_posts(queryset):
+    """Удаляет посты выборки пачками DELETE без загрузки объектов.
+
+    Удаление в обход Collector не запускает сигналы, поэтому индекс
+    поиска, счётчики и кэш приводятся в порядок здесь же.
+    """
+    with transaction.atomic():
+        post_ids, author_ids, group_ids = affected(queryset)
+        if not post_ids:
+            return 0
+        deleted = 0
+        for start in range(0, len(post_ids), DELETE_BATCH):
+            batch = post_ids[start:start + DELETE_BATCH]
+            # У записей лент нет сигналов и зависимых моделей, поэтому
+            # delete() удаляет их одним запросом без загрузки объектов.
+            TimelineEntry.objects.using(queryset.db).filter(
+                post_id__in=batch).delete()
+            deleted += raw_delete_posts(batch, queryset.db)
+        unindex_posts(post_ids, using=queryset.db)
+        counters.recount_authors(author_ids)
+        counters.recount_groups(group_ids)
+    invalidate_post_details(post_ids)
+    bump_generation()
+    return deleted
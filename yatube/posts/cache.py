@@ -0,0 +1,235 @@
+import hashlib
+import pickle
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from django.utils.safestring import mark_safe
+
+from core.lru import LRUCache
+
+from .models import Post
+
+# Увеличьте версию при изменении шаблонов карточек: старые ключи
+# перестанут читаться и вытеснятся из кэша сами.
+CARD_CACHE_VERSION: int = 2
+CARD_TIMEOUT: int = 60 * 60 * 24
+DELETE_BATCH: int = 500
+PAGE_TIMEOUT: int = 60 * 5
+DETAIL_TIMEOUT: int = 60 * 5
+# Горячие посты держим и в памяти процесса: чтение без обращения
+# к общему кэшу. Запись живёт недолго, так как другие процессы
+# не могут сбросить её напрямую.
+post_details = LRUCache(
+    'post_detail',
+    max_bytes=getattr(settings, 'POST_DETAIL_LRU_BYTES', 16 * 1024 * 1024),
+    ttl=getattr(settings, 'POST_DETAIL_LRU_TTL', 30),
+)
+# Поколение 'feed' меняется при любом изменении лент, 'profiles' —
+# только при правке групп и авторов, которые видны в карточках постов.
+FEED = 'feed'
+PROFILES = 'profiles'
+
+
+def card_version_key(scope, pk):
+    return f'posts:card_version:{scope}:{pk}'
+
+
+def card_versions(posts):
+    """Версии карточек авторов и групп постов, одним get_many."""
+    keys = {card_version_key('author', post.author_id) for post in posts}
+    keys.update(card_version_key('group', post.group_id)
+                for post in posts if post.group_id is not None)
+    versions = cache.get_many(keys)
+    for key in keys - versions.keys():
+        # Как и поколения, стартуем со времени: после вытеснения ключа
+        # версия не совпадёт с прежней и старые карточки не вернутся.
+        cache.add(key, int(time.time() * 1000), None)
+        versions[key] = cache.get(key)
+    return versions
+
+
+def card_key(variant, post, versions):
+    """Ключ карточки меняется с правкой поста, его автора или группы.
+
+    Сбрасывать карточки по списку постов не нужно: прежние ключи
+    просто перестают читаться и вытесняются по CARD_TIMEOUT.
+    """
+    author = versions[card_version_key('author', post.author_id)]
+    group = versions.get(card_version_key('group', post.group_id), '-')
+    updated = int(post.updated.timestamp() * 1000000)
+    return (f'posts:card:{variant}:{post.pk}:{updated}:'
+            f'{author}:{post.group_id}:{group}')
+
+
+def incr_card_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключа нет: следующее чтение заведёт новую версию само.
+            pass
+
+
+def bump_card_version(scope, pk):
+    """Делает устаревшими карточки всех постов автора или группы за O(1).
+
+    Как и bump_generation, версия сдвигается сразу и после коммита.
+    """
+    keys = [card_version_key(scope, pk)]
+    incr_card_versions(keys)
+    transaction.on_commit(lambda: incr_card_versions(keys))
+
+
+def primary_posts(posts):
+    """Посты, прочитанные с реплики, перечитывает с основной базы.
+
+    Карточка живёт в кэше сутки под ключом с версиями автора и группы.
+    Если собрать её из отстающей реплики сразу после смены версии,
+    старое имя попадёт под новый ключ надолго, поэтому кэш наполняется
+    с основной базы.
+    """
+    stale = [post.pk for post in posts
+             if post._state.db != DEFAULT_DB_ALIAS]
+    if not stale:
+        return posts
+    fresh = Post.objects.using(DEFAULT_DB_ALIAS).select_related(
+        'author', 'group').defer('text').in_bulk(stale)
+    return [fresh.get(post.pk, post) for post in posts]
+
+
+def render_cards(posts, variant):
+    """Возвращает HTML карточек постов, собирая кэш одним get_many."""
+    posts = list(posts)
+    versions = card_versions(posts)
+    keys = [card_key(variant, post, versions) for post in posts]
+    cached = cache.get_many(keys, version=CARD_CACHE_VERSION)
+    missing = primary_posts(
+        [post for key, post in zip(keys, posts) if key not in cached])
+    fresh = {post.pk: post for post in missing}
+    rendered = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(
+                f'posts/includes/post_card_{variant}.html',
+                {'post': fresh[post.pk]})
+            rendered[key] = html
+        cards.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT, version=CARD_CACHE_VERSION)
+    return cards
+
+
+def post_detail_key(post_id):
+    return f'posts:detail:{post_id}'
+
+
+def get_post_detail(post_id, version, load):
+    """Пост для post_detail: из памяти процесса, общего кэша или load().
+
+    version — всё, от чего зависит страница (время правки поста,
+    счётчик автора, поколение профилей). Запись с другой версией
+    считается промахом, поэтому правка в соседнем процессе не даст
+    показать устаревший пост. Каждый запрос получает свою копию.
+    load() должен читать с основной базы, а не с реплики.
+    """
+    entry = post_details.get(post_id)
+    if entry is not None and entry[0] == version:
+        return pickle.loads(entry[1])
+    key = post_detail_key(post_id)
+    shared = cache.get(key)
+    if shared is not None and shared[0] == version:
+        post = shared[1]
+    else:
+        post = load()
+        cache.set(key, (version, post), DETAIL_TIMEOUT)
+    data = pickle.dumps(post, pickle.HIGHEST_PROTOCOL)
+    post_details.set(post_id, (version, data), len(data))
+    return post
+
+
+def invalidate_post_details(post_ids):
+    """Сбрасывает закэшированные посты в этом процессе и в общем кэше."""
+    post_ids = list(post_ids)
+    for post_id in post_ids:
+        post_details.delete(post_id)
+    for start in range(0, len(post_ids), DELETE_BATCH):
+        cache.delete_many([post_detail_key(post_id) for post_id
+                           in post_ids[start:start + DELETE_BATCH]])
+
+
+def generation_key(scope):
+    return f'posts:generation:{scope}'
+
+
+def get_generation(scope=FEED):
+    """Текущее поколение данных для ключей кэша и ETag."""
+    key = generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        # Стартуем со времени, а не с единицы: если ключ вытеснят,
+        # новое поколение не совпадёт ни с одним из прежних.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def incr_generation(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(generation_key(scope))
+        except ValueError:
+            get_generation(scope)
+
+
+def bump_generation(*scopes):
+    """Делает устаревшими закэшированные страницы указанных поколений.
+
+    Поколение сдвигается сразу и ещё раз после фиксации транзакции,
+    чтобы страница, собранная до коммита, не осталась в новом поколении.
+    """
+    scopes = scopes or (FEED,)
+    incr_generation(scopes)
+    transaction.on_commit(lambda: incr_generation(scopes))
+
+
+def page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'posts:page:{get_generation()}:{path}'
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницу целиком для анонимных посетителей.
+
+    Авторизованные пользователи всегда получают свежую страницу
+    с персональной шапкой. Кэш сбрасывается сменой поколения
+    при изменении постов, групп и авторов.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') \
+                or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    PAGE_TIMEOUT,
+                )
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return wrapper
@@ -0,0 +1,78 @@
+import datetime
+import hashlib
+
+from .cache import CARD_CACHE_VERSION, FEED, PROFILES, get_generation
+from .lookups import get_author, get_group
+from .models import Group, Post, User
+
+
+def make_etag(request, *parts):
+    """ETag страницы: данные, пользователь (шапка) и параметры запроса."""
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    raw = ':'.join(str(part) for part in (
+        CARD_CACHE_VERSION,
+        datetime.date.today().year,
+        user_id,
+        request.GET.urlencode(),
+        *parts,
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request):
+    return make_etag(request, get_generation(FEED))
+
+
+def group_state(request, slug):
+    """Группа из кэша и её свежие счётчики, один запрос на request."""
+    if not hasattr(request, '_group_state'):
+        group = get_group(slug)
+        row = group and Group.objects.filter(pk=group.pk).values_list(
+            'posts_count', 'posts_updated').first()
+        request._group_state = (group, row) if row else None
+    return request._group_state
+
+
+def profile_state(request, username):
+    """Автор из кэша и его свежие счётчики, один запрос на request."""
+    if not hasattr(request, '_profile_state'):
+        author = get_author(username)
+        row = author and User.objects.filter(pk=author.pk).values_list(
+            'stats__posts_count', 'stats__posts_updated',
+            'stats__followers_count').first()
+        request._profile_state = (author, row) if row else None
+    return request._profile_state
+
+
+def group_etag(request, slug):
+    state = group_state(request, slug)
+    if state is None:
+        return None
+    group, row = state
+    return make_etag(request, group.pk, *row, get_generation(PROFILES))
+
+
+def profile_etag(request, username):
+    # Число подписчиков меняется при подписке: кнопка не устареет.
+    state = profile_state(request, username)
+    if state is None:
+        return None
+    author, row = state
+    return make_etag(request, author.pk, *row, get_generation(PROFILES))
+
+
+def post_state(request, post_id):
+    """Время правки поста и счётчик автора, один запрос на request."""
+    if not hasattr(request, '_post_state'):
+        request._post_state = Post.objects.filter(pk=post_id).values_list(
+            'updated', 'author__stats__posts_count').first()
+    return request._post_state
+
+
+def post_etag(request, post_id):
+    # Только ETag, без Last-Modified: на странице видны счётчик автора
+    # и имена из поколения PROFILES, которые не двигают post.updated.
+    row = post_state(request, post_id)
+    if row is None:
+        return None
+    return make_etag(request, *row, get_generation(PROFILES))
@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AuthorStats, Follow, Group, Post
+
+
+def shift_author(author_id, delta):
+    """Сдвигает счётчик постов автора на delta и отмечает время правки."""
+    now = timezone.now()
+    updated = AuthorStats.objects.filter(author_id=author_id).update(
+        posts_count=F('posts_count') + delta, posts_updated=now)
+    if not updated and delta > 0:
+        # Строки ещё нет: считаем один раз, дальше только F-выражения.
+        AuthorStats.objects.get_or_create(
+            author_id=author_id,
+            defaults={
+                'posts_count': Post.objects.filter(
+                    author_id=author_id).count(),
+                'posts_updated': now,
+            },
+        )
+
+
+def shift_followers(author_id, delta):
+    """Сдвигает счётчик подписчиков автора на delta."""
+    updated = AuthorStats.objects.filter(author_id=author_id).update(
+        followers_count=F('followers_count') + delta)
+    if not updated and delta > 0:
+        AuthorStats.objects.get_or_create(
+            author_id=author_id,
+            defaults={
+                'posts_count': Post.objects.filter(
+                    author_id=author_id).count(),
+                'followers_count': Follow.objects.filter(
+                    author_id=author_id).count(),
+            },
+        )
+
+
+def author_posts_count(author):
+    """Хранимое число постов автора; 0, если строки счётчика ещё нет."""
+    stats = getattr(author, 'stats', None)
+    return stats.posts_count if stats is not None else 0
+
+
+def shift_group(group_id, delta):
+    """Сдвигает счётчик постов группы на delta и отмечает время правки.
+
+    Дата последней записи пересчитывается тем же UPDATE: после удаления
+    или переноса самого нового поста она должна откатиться назад.
+    """
+    Group.objects.filter(pk=group_id).update(
+        posts_count=F('posts_count') + delta, posts_updated=timezone.now(),
+        last_pub_date=last_pub_date_subquery())
+
+
+def last_pub_date_subquery():
+    return Subquery(
+        Post.objects.filter(group=OuterRef('pk'))
+        .order_by('-pub_date')
+        .values('pub_date')[:1]
+    )
+
+
+def posts_count_subquery(field, model=Post):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_authors(author_ids):
+    """Пересчитывает счётчики перечисленных авторов с нуля."""
+    counts = dict(
+        Post.objects.filter(author_id__in=author_ids)
+        .order_by()
+        .values_list('author_id')
+        .annotate(Count('pk'))
+    )
+    now = timezone.now()
+    for author_id in author_ids:
+        AuthorStats.objects.update_or_create(
+            author_id=author_id,
+            defaults={
+                'posts_count': counts.get(author_id, 0),
+                'posts_updated': now,
+            },
+        )
+
+
+def recount_groups(group_ids):
+    """Пересчитывает счётчики перечисленных групп с нуля."""
+    Group.objects.filter(pk__in=group_ids).update(
+        posts_count=posts_count_subquery('group'),
+        posts_updated=timezone.now(),
+        last_pub_date=last_pub_date_subquery(),
+    )
+
+
+@transaction.atomic
+def recount_followers():
+    """Пересчитывает счётчики подписчиков всех авторов."""
+    missing = Follow.objects.filter(author__stats__isnull=True).values_list(
+        'author_id', flat=True).distinct()
+    AuthorStats.objects.bulk_create(
+        AuthorStats(author_id=author_id) for author_id in missing)
+    AuthorStats.objects.update(
+        followers_count=posts_count_subquery('author', model=Follow))
+
+
+@transaction.atomic
+def rebuild_post_counters():
+    """Пересчитывает все счётчики постов и подписчиков с нуля."""
+    now = timezone.now()
+    Group.objects.update(
+        posts_count=posts_count_subquery('group'), posts_updated=now,
+        last_pub_date=last_pub_date_subquery())
+    posts = dict(Post.objects.order_by().values_list('author_id')
+                 .annotate(Count('pk')))
+    followers = dict(Follow.objects.order_by().values_list('author_id')
+                     .annotate(Count('pk')))
+    AuthorStats.objects.all().delete()
+    AuthorStats.objects.bulk_create(
+        AuthorStats(author_id=author_id,
+                    posts_count=posts.get(author_id, 0),
+                    posts_updated=now,
+                    followers_count=followers.get(author_id, 0))
+        for author_id in posts.keys() | followers.keys()
+    )
@@ -0,0 +1,75 @@
+import csv
+import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CHUNK_SIZE: int = 2000
+# Имя колонки -> путь для values_list(); автор и группа через JOIN.
+COLUMNS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+}
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def parse_moment(value):
+    """Дата или дата-время из ISO 8601; дата означает начало суток."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Некорректная дата: {value!r}')
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(since=None, until=None, group=None):
+    """Посты для выгрузки по возрастанию id.
+
+    since/until ограничивают время последнего изменения (updated),
+    поэтому инкрементальная выгрузка захватывает и новые, и
+    отредактированные посты.
+    """
+    queryset = Post.objects.order_by('id')
+    if since is not None:
+        queryset = queryset.filter(updated__gte=since)
+    if until is not None:
+        queryset = queryset.filter(updated__lt=until)
+    if group:
+        queryset = queryset.filter(group__slug=group)
+    return queryset.values_list(*COLUMNS.values())
+
+
+def export_lines(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки; в памяти не больше chunk_size записей."""
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(COLUMNS, row))) + '\n'
@@ -0,0 +1,124 @@
+from django.contrib.syndication.views import Feed
+from django.http import Http404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from .cache import cache_anonymous_page
+from .conditional import (group_etag, group_state, index_etag, profile_etag,
+                          profile_state)
+from .models import Post
+
+FEED_LIMIT: int = 20
+
+
+class LatestPostsFeed(Feed):
+    """Лента последних постов сайта в RSS 2.0."""
+    title = 'Yatube: новые посты'
+    description = 'Последние записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.select_related(
+            'author', 'group').defer('text')[:FEED_LIMIT]
+
+    def item_title(self, item):
+        return item.headline
+
+    def item_description(self, item):
+        return item.excerpt
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        state = group_state(request, slug)
+        if state is None:
+            raise Http404('Группа не найдена')
+        return state[0]
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return group.posts.select_related(
+            'author', 'group').defer('text')[:FEED_LIMIT]
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        state = profile_state(request, username)
+        if state is None:
+            raise Http404('Пользователь не найден')
+        return state[0]
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return author.posts.select_related(
+            'author', 'group').defer('text')[:FEED_LIMIT]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return group.description
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+def feed_view(feed, etag_func):
+    """Лента с кэшем до нового поста и условными GET-запросами.
+
+    Ключи кэша и ETag те же, что у HTML-страниц: опрос ленты
+    без изменений стоит одного обращения к кэшу или строки из БД.
+    """
+    return condition(etag_func=etag_func)(cache_anonymous_page(feed))
+
+
+latest_rss = feed_view(LatestPostsFeed(), index_etag)
+latest_atom = feed_view(LatestPostsAtomFeed(), index_etag)
+group_rss = feed_view(GroupPostsFeed(), group_etag)
+group_atom = feed_view(GroupPostsAtomFeed(), group_etag)
+author_rss = feed_view(AuthorPostsFeed(), profile_etag)
+author_atom = feed_view(AuthorPostsAtomFeed(), profile_etag)
@@ -12,9 +12,13 @@ class PostForm(ModelForm):
                       'group': 'Группа, к которой будет отнесён пост'}
 
     def clean_text(self):
-        data = self.cleaned_data['text']
-        if data == '':
-            raise forms.ValidationError('заполните поле текст!')
-        if len(data) <= 10:
-            raise forms.ValidationError('объем поста слишком мал')
-        return data
+        return validate_text(self.cleaned_data['text'])
+
+
+def validate_text(data):
+    """Правила для текста поста, общие для формы и импорта."""
+    if data == '':
+        raise forms.ValidationError('заполните поле текст!')
+    if len(data) <= 10:
+        raise forms.ValidationError('объем поста слишком мал')
+    return data
@@ -0,0 +1,61 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Group, User
+
+LOOKUP_TIMEOUT: int = 60 * 60
+# Промахи живут недолго: новая группа или пользователь к тому же
+# сбрасывают свой ключ сами, а перебор адресов ботами не ходит в БД.
+MISSING_TIMEOUT: int = 60
+MISSING = 'missing'
+# Для профиля нужны только имя и адрес, не пароль и почта.
+AUTHOR_FIELDS = ('pk', 'username', 'first_name', 'last_name')
+
+
+def group_key(slug):
+    return 'posts:lookup:group:' + hashlib.md5(slug.encode()).hexdigest()
+
+
+def author_key(username):
+    return 'posts:lookup:author:' + hashlib.md5(
+        username.encode()).hexdigest()
+
+
+def cached_lookup(key, load):
+    # load() читает с основной базы: ответ отстающей реплики сразу после
+    # сброса ключа вернул бы в кэш старое имя или промах на целый час.
+    value = cache.get(key)
+    if value == MISSING:
+        return None
+    if value is None:
+        value = load()
+        if value is None:
+            cache.set(key, MISSING, MISSING_TIMEOUT)
+        else:
+            cache.set(key, value, LOOKUP_TIMEOUT)
+    return value
+
+
+def get_group(slug):
+    """Группа по slug из кэша; None, если такой нет."""
+    groups = Group.objects.using(DEFAULT_DB_ALIAS)
+    return cached_lookup(
+        group_key(slug), lambda: groups.filter(slug=slug).first())
+
+
+def get_author(username):
+    """Пользователь по username из кэша; None, если такого нет."""
+    users = User.objects.using(DEFAULT_DB_ALIAS).only(*AUTHOR_FIELDS)
+    return cached_lookup(
+        author_key(username),
+        lambda: users.filter(username=username).first())
+
+
+def forget_groups(*slugs):
+    cache.delete_many([group_key(slug) for slug in slugs])
+
+
+def forget_authors(*usernames):
+    cache.delete_many([author_key(username) for username in usernames])
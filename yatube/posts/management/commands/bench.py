@@ -0,0 +1,70 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmarks import DEFAULT_THRESHOLD, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95/p99), число и время SQL-запросов '
+            'представлений постов на текущей базе; сравнивает прогоны.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--depths', default='1,10,100',
+            help='Номера страниц лент через запятую.')
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Запросы от анонимного посетителя (только чтение).')
+        parser.add_argument(
+            '--compare', nargs=2, metavar=('BASE', 'CURRENT'),
+            help='Сравнить два сохранённых прогона вместо замера.')
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help='Допустимый относительный рост времени.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'])
+        try:
+            depths = [int(depth) for depth in options['depths'].split(',')]
+            report = run_benchmarks(
+                depths=depths,
+                repeat=options['repeat'],
+                cold_cache=options['cold_cache'],
+                anonymous=options['anonymous'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"сценарий":<28}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"SQL":>6}{"SQL мс":>9}')
+        for name, row in report['results'].items():
+            self.stdout.write(
+                f'{name:<28}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}'
+                f'{row["p99_ms"]:>9.2f}{row["queries"]:>6}'
+                f'{row["sql_ms"]:>9.2f}')
+
+    def compare(self, base_path, current_path, threshold):
+        reports = []
+        for path in (base_path, current_path):
+            with open(path, encoding='utf-8') as source:
+                reports.append(json.load(source))
+        regressions = compare(*reports, threshold=threshold)
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
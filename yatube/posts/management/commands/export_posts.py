@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (CHUNK_SIZE, EXPORT_FORMATS, export_lines,
+                          export_queryset, parse_moment)
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты с автором и группой в NDJSON или '
+            'CSV, не загружая таблицу в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout.')
+        parser.add_argument(
+            '--since', help='Посты, изменённые не раньше этой даты.')
+        parser.add_argument(
+            '--until', help='Посты, изменённые раньше этой даты.')
+        parser.add_argument('--group', help='Slug группы.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из БД за раз.')
+
+    def handle(self, *args, **options):
+        try:
+            since, until = (
+                parse_moment(options[name]) if options[name] else None
+                for name in ('since', 'until')
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        queryset = export_queryset(since, until, options['group'])
+        lines = export_lines(queryset, options['format'],
+                             chunk_size=options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import create_posts
+from posts.cache import bump_generation
+from posts.counters import recount_authors, recount_groups
+from posts.forms import validate_text
+from posts.models import Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+FIELDS = ('text', 'author', 'group', 'pub_date')
+MAX_ERRORS_SHOWN: int = 20
+
+
+class RowError(Exception):
+    pass
+
+
+class Lookup:
+    """Отображение ключ -> id, догружаемое из БД пачками по батчу."""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = set(keys) - set(self.ids)
+        if missing:
+            self.ids.update(
+                self.queryset.filter(**{f'{self.field}__in': missing})
+                .values_list(self.field, 'id'))
+            # Отсутствующие тоже запоминаем, чтобы не спрашивать снова.
+            self.ids.update((key, None) for key in missing - set(self.ids))
+
+    def __getitem__(self, key):
+        return self.ids.get(key)
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSON Lines или CSV пачками bulk_create. '
+            'Поля строки: text, author (username), group (slug), '
+            'pub_date (ISO 8601, необязательно).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с постами.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов вставлять одной транзакцией.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or self.guess_format(path)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        self.authors = Lookup(User.objects.all(), 'username')
+        self.groups = Lookup(Group.objects.all(), 'slug')
+        self.author_ids = set()
+        self.group_ids = set()
+        self.errors = 0
+        imported = 0
+        started = time.monotonic()
+        try:
+            with open(path, encoding='utf-8', newline='') as source:
+                batch = []
+                for number, row in self.read_rows(source, fmt):
+                    batch.append((number, row))
+                    if len(batch) >= batch_size:
+                        imported += self.import_batch(batch)
+                        batch = []
+                if batch:
+                    imported += self.import_batch(batch)
+        finally:
+            # Уже вставленные пачки остаются в базе и при сбое посреди
+            # файла: счётчики и кэш должны им соответствовать.
+            if self.author_ids:
+                recount_authors(self.author_ids)
+                recount_groups(self.group_ids)
+                bump_generation()
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {imported}, пропущено: {self.errors}, '
+            f'{imported / elapsed:.0f} строк/с.'))
+
+    def guess_format(self, path):
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        if extension in ('jsonl', 'ndjson', 'json'):
+            return 'jsonl'
+        if extension == 'csv':
+            return 'csv'
+        raise CommandError('Не удалось определить формат, укажите --format.')
+
+    def read_rows(self, source, fmt):
+        if fmt == 'csv':
+            # Строка 1 — заголовок.
+            yield from enumerate(csv.DictReader(source), start=2)
+            return
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                self.report(number, f'некорректный JSON: {error}')
+                continue
+            if not isinstance(row, dict):
+                self.report(number, 'ожидается JSON-объект')
+                continue
+            wrong = [name for name in FIELDS
+                     if not isinstance(row.get(name), (str, type(None)))]
+            if wrong:
+                self.report(number, 'должны быть строками: '
+                            + ', '.join(wrong))
+                continue
+            yield number, row
+
+    def report(self, number, message):
+        self.errors += 1
+        if self.errors <= MAX_ERRORS_SHOWN:
+            self.stderr.write(f'Строка {number}: {message}')
+
+    def build_post(self, row):
+        text = validate_text((row.get('text') or '').strip())
+        author_id = self.authors[row.get('author') or '']
+        if author_id is None:
+            raise RowError(f'нет автора {row.get("author")!r}')
+        group_id = None
+        if row.get('group'):
+            group_id = self.groups[row['group']]
+            if group_id is None:
+                raise RowError(f'нет группы {row["group"]!r}')
+        post = Post(text=text, author_id=author_id, group_id=group_id)
+        if row.get('pub_date'):
+            try:
+                pub_date = parse_datetime(row['pub_date'])
+            except ValueError:
+                pub_date = None
+            if pub_date is None:
+                raise RowError(f'некорректная дата {row["pub_date"]!r}')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+            post.pub_date = pub_date
+        # bulk_create обходит save(), выдержки считаем сами.
+        post.fill_excerpts()
+        return post
+
+    def import_batch(self, batch):
+        self.authors.load(row.get('author') or '' for _, row in batch)
+        self.groups.load(row['group'] for _, row in batch if row.get('group'))
+        posts = []
+        for number, row in batch:
+            try:
+                posts.append(self.build_post(row))
+            except ValidationError as error:
+                self.report(number, '; '.join(error.messages))
+            except RowError as error:
+                self.report(number, str(error))
+        if not posts:
+            return 0
+        create_posts(posts)
+        self.author_ids.update(post.author_id for post in posts)
+        self.group_ids.update(
+            post.group_id for post in posts if post.group_id is not None)
+        return len(posts)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import fts_enabled, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов (SQLite FTS5).'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write(
+                'Полнотекстовый индекс доступен только в SQLite.')
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.counters import recount_followers
+from posts.models import Follow, TimelineEntry, User
+from posts.timeline import TIMELINE_LENGTH, rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = ('Заполняет и чинит ленты подписок: пересчитывает подписчиков '
+            'и собирает ленты заново по подпискам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты собрать; по умолчанию все '
+                 'подписчики.')
+        parser.add_argument(
+            '--length', type=int, default=TIMELINE_LENGTH,
+            help='Сколько последних постов класть в каждую ленту.')
+
+    def handle(self, *args, **options):
+        recount_followers()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+            user_ids = list(users.values_list('pk', flat=True))
+            if len(user_ids) != len(set(options['usernames'])):
+                raise CommandError('Не все пользователи найдены.')
+        else:
+            # Лента без подписок тоже чинится: её надо очистить.
+            user_ids = Follow.objects.values_list('user_id', flat=True)\
+                .union(TimelineEntry.objects.values_list(
+                    'owner_id', flat=True)).iterator()
+        rebuilt = 0
+        for user_id in user_ids:
+            with transaction.atomic():
+                rebuild_timeline(user_id, options['length'])
+            rebuilt += 1
+            if options['verbosity'] > 1 and rebuilt % 1000 == 0:
+                self.stdout.write(f'Лент собрано: {rebuilt}')
+        self.stdout.write(self.style.SUCCESS(f'Лент собрано: {rebuilt}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_post_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимые счётчики постов авторов и групп.'
+
+    def handle(self, *args, **options):
+        rebuild_post_counters()
+        self.stdout.write(self.style.SUCCESS('Счётчики постов пересчитаны.'))
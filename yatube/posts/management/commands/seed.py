@@ -0,0 +1,151 @@
+import datetime
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+from faker import Faker
+
+from posts.bulk import create_posts
+from posts.cache import bump_generation
+from posts.counters import rebuild_post_counters
+from posts.models import Group, Post, User
+
+# Пароль-заглушка: вход под сгенерированными пользователями невозможен,
+# а хеширование не тратит время на миллионы строк.
+UNUSABLE_PASSWORD = '!seed'
+START_DATE = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def zipf_weights(count, exponent):
+    """Веса закона Ципфа: немного очень активных и длинный хвост."""
+    return list(itertools.accumulate(
+        1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Создаёт воспроизводимый синтетический набор пользователей, '
+            'групп и постов для нагрузочных тестов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Одинаковый seed даёт одинаковые данные.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--days', type=int, default=3 * 365,
+            help='На сколько дней от 2020-01-01 растянуть даты постов.')
+        parser.add_argument(
+            '--no-group-share', type=float, default=0.3,
+            help='Доля постов без группы.')
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и slug групп.')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['batch_size']) < 1:
+            raise CommandError('Нужен хотя бы один пользователь и батч.')
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        started = time.monotonic()
+        author_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        self.create_posts(options, author_ids, group_ids)
+        rebuild_post_counters()
+        bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(author_ids)}, групп '
+            f'{len(group_ids)}, постов {options["posts"]} за '
+            f'{time.monotonic() - started:.1f} с.'))
+
+    def batches(self, objects):
+        iterator = iter(objects)
+        while True:
+            batch = list(itertools.islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def insert(self, model, objects, key):
+        """Вставляет объекты пачками и возвращает их id по порядку.
+
+        bulk_create в SQLite не возвращает ключи, поэтому id читаются
+        обратно по уникальному полю key.
+        """
+        ids = []
+        for batch in self.batches(objects):
+            model.objects.bulk_create(batch)
+            keys = [getattr(obj, key) for obj in batch]
+            found = dict(model.objects.filter(**{f'{key}__in': keys})
+                         .values_list(key, 'id'))
+            ids.extend(found[value] for value in keys)
+        return ids
+
+    def create_users(self, count):
+        users = (
+            User(
+                username=f'{self.prefix}_{number}_{self.fake.user_name()}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=UNUSABLE_PASSWORD,
+            )
+            for number in range(count)
+        )
+        return self.insert(User, users, 'username')
+
+    def create_groups(self, count):
+        groups = (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.prefix}-{number}-'
+                     f'{slugify(self.fake.word(), allow_unicode=False)}'[:50],
+                description=self.fake.paragraph(),
+            )
+            for number in range(count)
+        )
+        return self.insert(Group, groups, 'slug')
+
+    def create_posts(self, options, author_ids, group_ids):
+        total = options['posts']
+        span = datetime.timedelta(days=options['days']) / max(total, 1)
+        # Авторов перемешиваем, чтобы «звёзды» не совпадали с первыми id.
+        authors = author_ids[:]
+        self.random.shuffle(authors)
+        author_weights = zipf_weights(len(authors), 1.1)
+        group_weights = zipf_weights(len(group_ids), 0.8)
+        no_group_share = options['no_group_share']
+
+        def posts():
+            for number in range(total):
+                group_id = None
+                if group_ids and self.random.random() >= no_group_share:
+                    group_id = self.random.choices(
+                        group_ids, cum_weights=group_weights)[0]
+                # Равномерно по времени с дрожанием: даты растут вместе
+                # с id, как в живой ленте, и не совпадают между постами.
+                pub_date = START_DATE + span * (number + self.random.random())
+                post = Post(
+                    text=self.fake.text(
+                        max_nb_chars=self.random.choice((80, 200, 600, 2000))),
+                    author_id=self.random.choices(
+                        authors, cum_weights=author_weights)[0],
+                    group_id=group_id,
+                    pub_date=pub_date,
+                )
+                # bulk_create обходит save(), выдержки считаем сами.
+                post.fill_excerpts()
+                yield post
+
+        created = 0
+        for batch in self.batches(posts()):
+            create_posts(batch)
+            created += len(batch)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Постов создано: {created} из {total}')
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:44
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def fill_updated(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post.objects.update(updated=F('pub_date'))
+    for group_id, last in Post.objects.order_by().values_list(
+            'group_id').annotate(Max('pub_date')):
+        Group.objects.filter(pk=group_id).update(posts_updated=last)
+    for author_id, last in Post.objects.order_by().values_list(
+            'author_id').annotate(Max('pub_date')):
+        AuthorStats.objects.filter(author_id=author_id).update(
+            posts_updated=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='posts_updated',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_updated',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:25
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_last_pub_date(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    for group_id, last in Post.objects.exclude(group=None).order_by(
+            ).values_list('group_id').annotate(Max('pub_date')):
+        Group.objects.filter(pk=group_id).update(last_pub_date=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_follow_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_pub_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_last_pub_date, migrations.RunPython.noop),
+    ]
@@ -1,39 +1,205 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import DEFERRED
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .utils import make_cursor
 
 User = get_user_model()
 
 LIMIT_TEXT: int = 15
+# Длина выдержек в словах: для карточек лент и для заголовка страницы.
+EXCERPT_WORDS: int = 50
+HEADLINE_WORDS: int = 30
+EXCERPT_FIELDS = ('excerpt', 'headline')
 
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=50, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    posts_updated = models.DateTimeField(
+        blank=True, null=True, editable=False)
+    last_pub_date = models.DateTimeField(
+        blank=True, null=True, editable=False)
+
+    COUNTER_FIELDS = ('posts_count', 'posts_updated', 'last_pub_date')
 
     def __str__(self):
         return f"{self.title}"
 
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только F-выражениями из posts.counters,
+        # поэтому при обычном сохранении группы их не перезаписываем.
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Post(models.Model):
     text = models.TextField()
-    pub_date = models.DateTimeField(auto_now_add=True)
+    # Выдержки считаются при сохранении: ленты читают их вместо text.
+    excerpt = models.TextField(blank=True, editable=False)
+    headline = models.TextField(blank=True, editable=False)
+    # default вместо auto_now_add: импорт переносит исходные даты постов.
+    pub_date = models.DateTimeField(default=timezone.now, editable=False)
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
+        db_index=False,
     )
 
     def __str__(self):
         return self.text[:LIMIT_TEXT]
 
+    def fill_excerpts(self):
+        """Выдержки из текста, как у фильтра truncatewords.
+
+        Вызывается из save(); массовые вставки через bulk_create
+        вызывают его сами.
+        """
+        truncator = Truncator(self.text)
+        self.excerpt = truncator.words(EXCERPT_WORDS, truncate=' …')
+        self.headline = truncator.words(HEADLINE_WORDS, truncate=' …')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if 'text' not in self.get_deferred_fields() and (
+                update_fields is None or 'text' in update_fields):
+            self.fill_excerpts()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *EXCERPT_FIELDS}
+        if update_fields is not None:
+            # updated входит в ключ карточки и в ETag: любая правка его
+            # сдвигает, иначе карточка поста не обновится.
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counted_state()
+        return instance
+
+    def remember_counted_state(self):
+        """Запоминает автора и группу, по которым пост учтён в счётчиках."""
+        self._counted_author_id = self.__dict__.get('author_id', DEFERRED)
+        self._counted_group_id = self.__dict__.get('group_id', DEFERRED)
+
+    @property
+    def cursor(self):
+        return make_cursor(self.pub_date, self.pk)
+
     group = models.ForeignKey(
         Group,
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
-        related_name='posts'
+        related_name='posts',
+        db_index=False,
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        # Индексы повторяют порядок лент: фильтр по автору или группе
+        # и сортировка по (pub_date, id) читаются из индекса без сортировки.
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_timeline_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_timeline_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_timeline_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Хранимые счётчики автора, чтобы не считать посты на каждой странице.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    posts_updated = models.DateTimeField(blank=True, null=True)
+    followers_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.author}: {self.posts_count}"
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
     )
+    created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='no_self_follow'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.author}"
+
+
+class TimelineEntry(models.Model):
+    """Пост в заранее собранной ленте подписок пользователя.
+
+    Строки пишутся при публикации (fan-out on write), поэтому лента
+    подписчика читается одним проходом по индексу owner + дата.
+    pub_date и author копируются из поста ради этого индекса.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-pub_date', '-post'],
+                         name='timeline_owner_idx'),
+            models.Index(fields=['owner', 'author'],
+                         name='timeline_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}: {self.post_id}"
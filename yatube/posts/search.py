@@ -0,0 +1,79 @@
+from django.db import connections, router
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def get_connection(using=None):
+    return connections[using or router.db_for_write(Post)]
+
+
+def fts_enabled(using=None):
+    """Полнотекстовый индекс FTS5 есть только в SQLite."""
+    return get_connection(using).vendor == 'sqlite'
+
+
+def build_match(query):
+    """Превращает ввод пользователя в безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 из запроса
+    не интерпретируются, а слова объединяются через AND.
+    """
+    return ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def search_posts(queryset, query):
+    """Фильтрует посты по запросу, самые релевантные идут первыми."""
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    if not fts_enabled(queryset.db):
+        return queryset.filter(text__icontains=query.strip())
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = posts_post.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[match],
+        select={'rank': f'{FTS_TABLE}.rank'},
+        order_by=['rank', '-pub_date', '-id'],
+    )
+
+
+def index_posts(posts, using=None):
+    """Добавляет посты в индекс или обновляет их текст."""
+    if not fts_enabled(using):
+        return
+    rows = [(post.pk, post.text) for post in posts]
+    with get_connection(using).cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk, _ in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)', rows)
+
+
+def unindex_posts(post_ids, using=None):
+    if not fts_enabled(using):
+        return
+    with get_connection(using).cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in post_ids])
+
+
+def rebuild_search_index(using=None):
+    """Перестраивает индекс по всей таблице постов."""
+    if not fts_enabled(using):
+        return
+    with get_connection(using).cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
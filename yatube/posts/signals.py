@@ -0,0 +1,159 @@
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, lookups, timeline
+from .cache import (FEED, PROFILES, bump_card_version, bump_generation,
+                    invalidate_post_details)
+from .models import Follow, Group, Post, User
+from .search import index_posts, unindex_posts
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    """Учитывает пост в счётчиках автора и группы.
+
+    Новый пост увеличивает счётчики, перенос к другому автору или
+    в другую группу переносит единицу, а любая правка обновляет
+    время изменения постов у затронутых автора и группы.
+    """
+    if raw:
+        return
+    authors = {instance.author_id: int(created)}
+    groups = {instance.group_id: int(created)}
+    if not created:
+        old_author_id = getattr(instance, '_counted_author_id', DEFERRED)
+        old_group_id = getattr(instance, '_counted_group_id', DEFERRED)
+        if old_author_id is not DEFERRED \
+                and old_author_id != instance.author_id:
+            authors[old_author_id] = -1
+            authors[instance.author_id] = 1
+        if old_group_id is not DEFERRED \
+                and old_group_id != instance.group_id:
+            groups[old_group_id] = -1
+            groups[instance.group_id] = 1
+    authors.pop(None, None)
+    groups.pop(None, None)
+    with transaction.atomic():
+        for author_id, delta in authors.items():
+            counters.shift_author(author_id, delta)
+        for group_id, delta in groups.items():
+            counters.shift_group(group_id, delta)
+    instance.remember_counted_state()
+    invalidate_post_details([instance.pk])
+    bump_generation()
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, using=None, **kwargs):
+    """Поддерживает полнотекстовый индекс в актуальном состоянии."""
+    if not raw:
+        index_posts([instance], using=using)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, raw=False, **kwargs):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    """Новая подписка сразу показывает последние посты автора."""
+    if not created or raw:
+        return
+    counters.shift_followers(instance.author_id, 1)
+    if not timeline.is_celebrity(instance.author_id):
+        timeline.fill_timeline(instance.user_id, [instance.author_id])
+    # Число подписчиков выводится в профиле, закэшированном целиком.
+    bump_generation()
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    counters.shift_followers(instance.author_id, -1)
+    timeline.drop_author(instance.user_id, instance.author_id)
+    bump_generation()
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, using=None, **kwargs):
+    unindex_posts([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    with transaction.atomic():
+        counters.shift_author(instance.author_id, -1)
+        if instance.group_id is not None:
+            counters.shift_group(instance.group_id, -1)
+    invalidate_post_details([instance.pk])
+    bump_generation()
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_cards(sender, instance, created, raw=False, **kwargs):
+    """Название и адрес группы выводятся в карточках её постов."""
+    if raw:
+        return
+    bump_generation(FEED, PROFILES)
+    if not created:
+        bump_card_version('group', instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_cards(sender, instance, **kwargs):
+    bump_card_version('group', instance.pk)
+    bump_generation(FEED, PROFILES)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    """Имя автора выводится в карточках его постов."""
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    bump_card_version('author', instance.pk)
+    bump_generation(FEED, PROFILES)
+
+
+@receiver(pre_save, sender=Group)
+def forget_renamed_group(sender, instance, raw=False, **kwargs):
+    """При смене slug старый адрес перестаёт вести на группу."""
+    if raw or instance.pk is None:
+        return
+    old_slug = Group.objects.filter(pk=instance.pk).values_list(
+        'slug', flat=True).first()
+    if old_slug is not None:
+        lookups.forget_groups(old_slug)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    # Новая группа заодно снимает закэшированный промах по своему slug.
+    lookups.forget_groups(instance.slug)
+
+
+@receiver(pre_save, sender=User)
+def forget_renamed_author(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    if raw or instance.pk is None \
+            or update_fields == frozenset({'last_login'}):
+        return
+    old_username = User.objects.filter(pk=instance.pk).values_list(
+        'username', flat=True).first()
+    if old_username is not None:
+        lookups.forget_authors(old_username)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_author(sender, instance, update_fields=None, **kwargs):
+    """Имя в профиле берётся из кэша: любая правка его сбрасывает."""
+    if update_fields == frozenset({'last_login'}):
+        return
+    lookups.forget_authors(instance.username)
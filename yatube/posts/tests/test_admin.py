@@ -0,0 +1,105 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import (AuthorStats, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.search import search_posts
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.group2 = Group.objects.create(
+            title=('Заголовок для тестовой группы 2'),
+            slug='test_slug2',
+            description="Тестовое описание 2",)
+        for x in range(6):
+            Post.objects.create(
+                author=cls.user,
+                text=f'{x} тестовая запись',
+                group=(cls.group, None)[x % 2],)
+        cls.changelist_url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def run_action(self, action, posts, **data):
+        return self.admin_client.post(self.changelist_url, {
+            'action': action,
+            '_selected_action': [post.pk for post in posts],
+            **data,
+        })
+
+    def test_changelist_queries_do_not_grow(self):
+        """Список постов не делает запросов на каждую строку."""
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.admin_client.get(self.changelist_url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            return len(queries)
+
+        before = count_queries()
+        for x in range(10):
+            Post.objects.create(
+                author=PostAdminTest.user,
+                text=f'{x} ещё запись',
+                group=PostAdminTest.group2,)
+        self.assertEqual(count_queries(), before)
+
+    def test_changelist_has_no_group_dropdown(self):
+        """Группы не выводятся выпадающим списком в каждой строке."""
+        response = self.admin_client.get(self.changelist_url)
+        self.assertNotContains(response, 'name="form-0-group"')
+        self.assertNotContains(response, '<option value="%s">'
+                               % PostAdminTest.group2.pk)
+
+    def test_move_action_updates_counters(self):
+        """Перенос выполняется одним UPDATE и пересчитывает группы."""
+        posts = list(Post.objects.filter(group=PostAdminTest.group))
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action('move_to_group', posts,
+                            group=PostAdminTest.group2.pk)
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            Group.objects.get(pk=PostAdminTest.group.pk).posts_count, 0)
+        self.assertEqual(
+            Group.objects.get(pk=PostAdminTest.group2.pk).posts_count,
+            len(posts))
+        self.assertFalse(Post.objects.filter(
+            group=PostAdminTest.group).exists())
+
+    def test_delete_action_cleans_up(self):
+        """Удаление пачкой DELETE пересчитывает счётчики и поиск."""
+        Follow.objects.create(user=PostAdminTest.admin,
+                              author=PostAdminTest.user)
+        posts = list(Post.objects.filter(group=PostAdminTest.group))
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action('delete_posts', posts)
+        deletes = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE FROM "posts_post"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(
+            Group.objects.get(pk=PostAdminTest.group.pk).posts_count, 0)
+        self.assertEqual(
+            AuthorStats.objects.get(author=PostAdminTest.user).posts_count,
+            3)
+        self.assertEqual(
+            search_posts(Post.objects.all(), 'тестовая').count(), 3)
+        self.assertEqual(TimelineEntry.objects.count(), 3)
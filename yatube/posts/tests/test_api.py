@@ -0,0 +1,94 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        POSTS_COUNT = 13
+        cls.user = User.objects.create_user(
+            username='test_name1', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        for x in range(POSTS_COUNT):
+            Post.objects.create(
+                author=cls.user,
+                text=f'{x}Тестовая запись нового поста',
+                group=cls.group if x % 2 else None,)
+        cls.posts = list(Post.objects.all())
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_json(self, name, params=None, **kwargs):
+        response = self.guest_client.get(
+            reverse(f'api:{name}', kwargs=kwargs), params or {})
+        return response, response.json()
+
+    def test_post_list_walks_feed_by_cursor(self):
+        """Лента постов листается курсором без пропусков и повторов."""
+        response, data = self.get_json('post_list')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNone(data['previous'])
+        second = self.guest_client.get(data['next']).json()
+        ids = [row['id'] for row in data['results'] + second['results']]
+        self.assertEqual(ids, [post.id for post in ApiTests.posts])
+        self.assertIsNone(second['next'])
+        first = self.guest_client.get(second['previous']).json()
+        self.assertEqual(first['results'], data['results'])
+
+    def test_post_list_single_query(self):
+        """Страница ленты — один запрос без COUNT."""
+        with self.assertNumQueries(1):
+            self.get_json('post_list')
+
+    def test_field_selection(self):
+        _, data = self.get_json('post_list', {'fields': 'id,author,group'})
+        self.assertEqual(set(data['results'][0]), {'id', 'author', 'group'})
+        self.assertEqual(data['results'][0]['author'], 'test_name1')
+        response, data = self.get_json('post_list', {'fields': 'password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_detail_endpoints(self):
+        post = ApiTests.posts[0]
+        _, data = self.get_json('post_detail', post_id=post.id)
+        self.assertEqual(data['text'], post.text)
+        _, data = self.get_json('group_detail', slug=ApiTests.group.slug)
+        self.assertEqual(data['posts_count'], 6)
+        _, data = self.get_json('author_detail',
+                                username=ApiTests.user.username)
+        self.assertEqual(data['posts_count'], 13)
+        self.assertNotIn('password', data)
+        self.assertNotIn('email', data)
+        response, _ = self.get_json('post_detail', post_id=0)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_nested_post_lists(self):
+        _, data = self.get_json('group_posts', {'fields': 'group'},
+                                slug=ApiTests.group.slug)
+        self.assertEqual({row['group'] for row in data['results']},
+                         {ApiTests.group.slug})
+        _, data = self.get_json('author_posts', {'limit': 20},
+                                username=ApiTests.user.username)
+        self.assertEqual(len(data['results']), 13)
+
+    def test_directory_lists(self):
+        _, data = self.get_json('group_list')
+        self.assertEqual([row['slug'] for row in data['results']],
+                         [ApiTests.group.slug])
+        _, data = self.get_json('author_list', {'limit': 1})
+        self.assertEqual(data['results'][0]['username'], 'test_name1')
+
+    def test_api_is_read_only(self):
+        response = self.guest_client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
@@ -0,0 +1,277 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import bulk
+from posts.models import (AuthorStats, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.search import search_posts
+
+
+class ImportPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+
+    def write_file(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_posts(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_posts', path, *args,
+                     stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_jsonl_in_batches(self):
+        """JSON Lines импортируется пачками с исходными датами."""
+        rows = [
+            {'text': f'{x} импортированная запись', 'author': 'test_name1',
+             'group': 'test_slug' if x % 2 else '',
+             'pub_date': f'2020-01-{x + 1:02d}T10:00:00'}
+            for x in range(5)
+        ]
+        path = self.write_file('posts.jsonl', '\n'.join(
+            json.dumps(row, ensure_ascii=False) for row in rows))
+        stdout, _ = self.import_posts(path, '--batch-size', '2')
+        self.assertIn('Импортировано постов: 5', stdout)
+        self.assertEqual(Post.objects.count(), 5)
+        oldest = Post.objects.last()
+        self.assertEqual(oldest.pub_date.date(), datetime.date(2020, 1, 1))
+        self.assertEqual(oldest.excerpt, oldest.text)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 5)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 2)
+        self.assertEqual(
+            search_posts(Post.objects.all(), 'импортированная').count(), 5)
+
+    def test_import_csv_validates_rows(self):
+        """Строки с коротким текстом и неизвестным автором пропускаются."""
+        path = self.write_file('posts.csv', (
+            'text,author,group\n'
+            'Достаточно длинный текст поста,test_name1,test_slug\n'
+            'коротко,test_name1,\n'
+            'Достаточно длинный текст поста,nobody,\n'
+            'Достаточно длинный текст поста,test_name1,no_group\n'
+        ))
+        stdout, stderr = self.import_posts(path)
+        self.assertIn('Импортировано постов: 1, пропущено: 3', stdout)
+        self.assertIn('объем поста слишком мал', stderr)
+        self.assertIn("нет автора 'nobody'", stderr)
+        self.assertEqual(Post.objects.get().group, self.group)
+
+    def test_import_reports_non_string_fields(self):
+        """Нестроковые значения полей — ошибка строки, а не падение."""
+        rows = [
+            {'text': 12345678901, 'author': 'test_name1'},
+            {'text': 'Достаточно длинный текст поста', 'author': ['x']},
+            {'text': 'Достаточно длинный текст поста', 'author': 'test_name1',
+             'group': None},
+        ]
+        path = self.write_file('posts.jsonl', '\n'.join(
+            json.dumps(row, ensure_ascii=False) for row in rows))
+        stdout, stderr = self.import_posts(path)
+        self.assertIn('Импортировано постов: 1, пропущено: 2', stdout)
+        self.assertIn('Строка 1: должны быть строками: text', stderr)
+        self.assertIn('Строка 2: должны быть строками: author', stderr)
+        post = Post.objects.get()
+        self.assertEqual(
+            search_posts(Post.objects.all(), 'длинный').get(), post)
+
+    def test_import_reports_impossible_dates(self):
+        """Невозможная дата — ошибка строки, остальные строки импортируются.
+        """
+        rows = [
+            {'text': 'Достаточно длинный текст поста', 'author': 'test_name1',
+             'pub_date': '2020-01-01T00:00:00'},
+            {'text': 'Достаточно длинный текст поста', 'author': 'test_name1',
+             'pub_date': '2020-13-45T00:00:00'},
+        ]
+        path = self.write_file('posts.jsonl', '\n'.join(
+            json.dumps(row, ensure_ascii=False) for row in rows))
+        stdout, stderr = self.import_posts(path, '--batch-size', '1')
+        self.assertIn('Импортировано постов: 1, пропущено: 1', stdout)
+        self.assertIn("некорректная дата '2020-13-45T00:00:00'", stderr)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 1)
+
+    def test_failed_import_keeps_counters_in_step(self):
+        """Сбой посреди файла не оставляет счётчики устаревшими."""
+        path = self.write_file('posts.jsonl', '\n'.join(
+            json.dumps({'text': f'{x} достаточно длинная запись',
+                        'author': 'test_name1'}, ensure_ascii=False)
+            for x in range(2)))
+        create_posts = bulk.create_posts
+        calls = []
+
+        def fail_second(posts):
+            calls.append(posts)
+            if len(calls) > 1:
+                raise RuntimeError('сбой')
+            return create_posts(posts)
+
+        with mock.patch('posts.management.commands.import_posts.'
+                        'create_posts', fail_second):
+            with self.assertRaises(RuntimeError):
+                self.import_posts(path, '--batch-size', '1')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 1)
+
+    def test_import_fans_out_to_followers(self):
+        """Импортированные посты попадают в ленты подписчиков автора."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        Post.objects.create(author=reader, text='Запись до импорта')
+        path = self.write_file('posts.jsonl', '\n'.join(
+            json.dumps({'text': f'{x} достаточно длинная запись',
+                        'author': 'test_name1'},
+                       ensure_ascii=False)
+            for x in range(3)))
+        self.import_posts(path, '--batch-size', '2')
+        self.assertEqual(
+            sorted(TimelineEntry.objects.filter(owner=reader).values_list(
+                'post_id', flat=True)),
+            sorted(Post.objects.filter(author=self.user).values_list(
+                'pk', flat=True)))
+
+
+class ExportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',
+            group=cls.group,)
+        cls.post2 = Post.objects.create(
+            author=cls.user,
+            text='Вторая тестовая запись без группы',)
+
+    def test_export_ndjson_command(self):
+        """Команда выгружает каждый пост с автором и группой."""
+        stdout = StringIO()
+        call_command('export_posts', '--chunk-size', '1', stdout=stdout)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [self.post.id, self.post2.id])
+        self.assertEqual(rows[0]['author'], 'test_name1')
+        self.assertEqual(rows[0]['group'], 'test_slug')
+        self.assertIsNone(rows[1]['group'])
+
+    def test_export_filters(self):
+        stdout = StringIO()
+        call_command('export_posts', '--format', 'csv',
+                     '--group', 'test_slug', stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,text,pub_date,updated,author,group')
+        self.assertEqual(len(lines), 2)
+        stdout = StringIO()
+        call_command('export_posts', '--since', '2999-01-01', stdout=stdout)
+        self.assertEqual(stdout.getvalue(), '')
+
+    def test_export_endpoint_is_streamed_for_staff_only(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:export'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        client.force_login(self.staff)
+        response = client.get(reverse('posts:export'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 3)
+        response = client.get(reverse('posts:export'), {'since': 'вчера'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class SeedCommandTest(TestCase):
+    def seed(self, *args):
+        call_command('seed', '--users', '5', '--groups', '3',
+                     '--posts', '60', '--batch-size', '25', *args,
+                     stdout=StringIO())
+        return list(Post.objects.order_by('pub_date').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'))
+
+    def clear(self):
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_seed_is_reproducible(self):
+        """Один и тот же seed порождает одинаковые данные."""
+        first = self.seed()
+        self.assertEqual(len(first), 60)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Group.objects.count(), 3)
+        self.clear()
+        self.assertEqual(self.seed(), first)
+        self.clear()
+        self.assertNotEqual(self.seed('--seed', '7'), first)
+
+    def test_seed_distribution_and_counters(self):
+        """Авторы неравномерны, счётчики совпадают с таблицей постов."""
+        self.seed()
+        counts = sorted(
+            (stats.posts_count for stats in AuthorStats.objects.all()),
+            reverse=True)
+        self.assertEqual(sum(counts), 60)
+        self.assertGreater(counts[0], 60 / 5)
+        self.assertEqual(
+            sum(Group.objects.values_list('posts_count', flat=True)),
+            Post.objects.exclude(group=None).count())
+
+
+class BenchCommandTest(TestCase):
+    def test_bench_reports_and_compares(self):
+        """Замер сохраняет JSON, сравнение находит регрессию."""
+        call_command('seed', '--users', '3', '--groups', '2',
+                     '--posts', '30', stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        base = os.path.join(directory, 'base.json')
+        current = os.path.join(directory, 'current.json')
+        self.addCleanup(shutil.rmtree, directory)
+        call_command('bench', '--repeat', '2', '--depths', '1,2',
+                     '--output', base, stdout=StringIO())
+        with open(base, encoding='utf-8') as source:
+            report = json.load(source)
+        self.assertEqual(report['meta']['posts'], 30)
+        row = report['results']['index?page=1']
+        self.assertEqual(row['status'], HTTPStatus.OK)
+        self.assertGreaterEqual(row['p99_ms'], row['p50_ms'])
+        self.assertIn('profile?after@2', report['results'])
+        self.assertEqual(
+            report['results']['post_create:post']['status'],
+            HTTPStatus.FOUND)
+        self.assertEqual(Post.objects.count(), 30)
+        row['queries'] += 1
+        with open(current, 'w', encoding='utf-8') as output:
+            json.dump(report, output)
+        call_command('bench', '--compare', base, base, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('bench', '--compare', base, current,
+                         stdout=StringIO(), stderr=StringIO())
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, Post
 
 User = get_user_model()
 
@@ -29,3 +32,79 @@ class PostModelTest(TestCase):
         expected_object_name_group = group.title
         self.assertEqual(expected_object_name_post, str(post))
         self.assertEqual(expected_object_name_group, str(group))
+
+    def test_excerpts_follow_text(self):
+        """Выдержки считаются при сохранении и правке текста."""
+        post = Post.objects.create(
+            author=PostModelTest.user,
+            text=' '.join(f'слово{x}' for x in range(60)),
+        )
+        self.assertEqual(len(post.excerpt.split()), 51)
+        self.assertTrue(post.excerpt.endswith('слово49 …'))
+        self.assertTrue(post.headline.endswith('слово29 …'))
+        post.text = 'Короткий текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Короткий текст')
+        self.assertEqual(post.headline, 'Короткий текст')
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test_slug2',
+            description='Тестовое описание 2',
+        )
+
+    def assertCounters(self, author_count, group_count, group2_count):
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count,
+            author_count)
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, group_count)
+        self.assertEqual(
+            Group.objects.get(pk=self.group2.pk).posts_count, group2_count)
+
+    def test_counters_follow_create_move_delete(self):
+        """Счётчики учитывают создание, перенос и удаление поста."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        Post.objects.create(author=self.user, text='Тестовый пост 2')
+        self.assertCounters(2, 1, 0)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group2
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.text = 'Изменённый текст'
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_group_save_keeps_counter(self):
+        """Сохранение группы не затирает счётчик постов."""
+        group = Group.objects.get(pk=self.group.pk)
+        Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        group.title = 'Новое название'
+        group.save()
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, 1)
+
+    def test_recount_posts_command(self):
+        """Команда recount_posts восстанавливает счётчики."""
+        Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        AuthorStats.objects.all().delete()
+        Group.objects.update(posts_count=42)
+        call_command('recount_posts', stdout=StringIO())
+        self.assertCounters(1, 1, 0)
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from http import HTTPStatus
 from posts.models import Group, Post
@@ -27,6 +28,7 @@ class TaskURLTests(TestCase):
         cls.edit_url = f'/posts/{cls.post.id}/edit/'
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
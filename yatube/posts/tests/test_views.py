@@ -1,8 +1,20 @@
 
-from django.test import Client, TestCase
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Group, Post, User
+from django.utils import timezone
+from http import HTTPStatus
+from posts.models import (AuthorStats, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.cache import post_details
 from posts.forms import PostForm
+from posts.utils import CountedPaginator
 import time
 
 
@@ -36,6 +48,7 @@ class PostPagesTests(TestCase):
             text='Третья тестовая запись для создания нового поста',)
 
     def setUp(self):
+        cache.clear()
         self.client = User.objects.create_user(username='Noname',)
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -147,6 +160,7 @@ class PaginatorViewsTest(TestCase):
                 group=cls.group,)
 
     def setUp(self):
+        cache.clear()
         self.unathorized_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -193,3 +207,844 @@ class PaginatorViewsTest(TestCase):
                     args={PaginatorViewsTest.user.username}) + '?page=2')
         self.assertEqual(len(response.context['page_obj']),
                          PaginatorViewsTest.SECOND_PAGE)
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов к БД на страницах не зависит от числа постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        POSTS_COUNT = 13
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.user2 = User.objects.create_user(username='test_name2',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.group2 = Group.objects.create(
+            title=('Заголовок для тестовой группы 2'),
+            slug='test_slug2',
+            description="Тестовое описание 2",)
+        for x in range(POSTS_COUNT):
+            cls.post = Post.objects.create(
+                author=(cls.user, cls.user2)[x % 2],
+                text=f'{x}Тестовая запись нового поста',
+                group=(cls.group, cls.group2, None)[x % 3],)
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    def test_pages_query_budget(self):
+        """Страницы укладываются в бюджет запросов к БД."""
+        budgets = {
+            reverse('posts:index'): 2,
+            # Число записей ленты уже в кэше после первой страницы.
+            reverse('posts:index') + '?page=2': 1,
+            reverse('posts:group_list',
+                    kwargs={'slug': QueryBudgetTest.group.slug}): 3,
+            reverse('posts:profile',
+                    args={QueryBudgetTest.user.username}): 3,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': QueryBudgetTest.post.id}): 2,
+        }
+        for address, budget in budgets.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(budget):
+                    self.unathorized_client.get(address)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN SQLite')
+    def test_listing_queries_use_timeline_indexes(self):
+        """Ленты читаются по составным индексам без временной сортировки."""
+        indexes = {
+            reverse('posts:index'): 'post_timeline_idx',
+            reverse('posts:index') + '?page=2': 'post_timeline_idx',
+            reverse('posts:index') + f'?after={self.post.cursor}':
+                'post_timeline_idx',
+            reverse('posts:group_list',
+                    kwargs={'slug': QueryBudgetTest.group.slug}):
+                'post_group_timeline_idx',
+            reverse('posts:group_list',
+                    kwargs={'slug': QueryBudgetTest.group.slug})
+                + f'?after={self.post.cursor}': 'post_group_timeline_idx',
+            reverse('posts:profile',
+                    args={QueryBudgetTest.user.username}):
+                'post_author_timeline_idx',
+        }
+        for address, index in indexes.items():
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    self.unathorized_client.get(address)
+                listing = [
+                    query['sql'] for query in queries.captured_queries
+                    if query['sql'].startswith('SELECT "posts_post"."id"')
+                ]
+                self.assertTrue(listing)
+                self.assertFalse(any('"posts_post"."text"' in sql
+                                     for sql in listing))
+                with connection.cursor() as cursor:
+                    for sql in listing:
+                        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                        plan = ' '.join(row[-1] for row in cursor.fetchall())
+                        self.assertIn(index, plan)
+                        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class CountedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        for x in range(3):
+            Post.objects.create(
+                author=cls.user,
+                text=f'{x}Тестовая запись нового поста',
+                group=cls.group,)
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    def test_elided_page_range(self):
+        """Ссылки на страницы рисуются окном с пропусками."""
+        paginator = CountedPaginator(range(1000), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, '…', 48, 49, 50, 51, 52, '…', 100],
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(2)),
+            [1, 2, 3, 4, '…', 100],
+        )
+        self.assertEqual(
+            list(CountedPaginator(range(30), 10).get_elided_page_range(2)),
+            [1, 2, 3],
+        )
+
+    def test_stored_count_replaces_count_query(self):
+        """Число страниц берётся из счётчика, а не из COUNT(*)."""
+        Group.objects.filter(pk=self.group.pk).update(posts_count=1000)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.unathorized_client.get(
+                reverse('posts:group_list', kwargs={'slug': 'test_slug'}))
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in queries.captured_queries))
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.num_pages, 100)
+        self.assertEqual(len(page_obj), 3)
+        self.assertContains(response, '?page=100')
+        self.assertNotContains(response, '?page=50"')
+
+    def test_index_count_is_cached(self):
+        """COUNT(*) главной ленты выполняется один раз на время кэша."""
+        self.unathorized_client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.unathorized_client.get(reverse('posts:index') + '?page=1')
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in queries.captured_queries))
+
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        POSTS_COUNT = 13
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        for x in range(POSTS_COUNT):
+            Post.objects.create(
+                author=cls.user,
+                text=f'{x}Тестовая запись нового поста',
+                group=cls.group,)
+        cls.posts = list(Post.objects.all())
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    FIRST_PAGE = 10
+    SECOND_PAGE = 3
+
+    def test_keyset_pages_cover_feed_in_order(self):
+        """Курсор ?after= ведёт к более старым записям без пропусков."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': KeysetPaginatorTest.group.slug}),
+            reverse('posts:profile',
+                    args={KeysetPaginatorTest.user.username}),
+        )
+        cursor = KeysetPaginatorTest.posts[self.FIRST_PAGE - 1].cursor
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.unathorized_client.get(
+                    address, {'after': cursor})
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), self.SECOND_PAGE)
+                self.assertEqual(
+                    list(page_obj),
+                    KeysetPaginatorTest.posts[self.FIRST_PAGE:])
+                self.assertFalse(page_obj.has_next())
+                self.assertTrue(page_obj.has_previous())
+
+    def test_keyset_before_returns_newer_page(self):
+        """Курсор ?before= возвращает предыдущую (более новую) страницу."""
+        cursor = KeysetPaginatorTest.posts[self.FIRST_PAGE].cursor
+        response = self.unathorized_client.get(
+            reverse('posts:index'), {'before': cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj),
+                         KeysetPaginatorTest.posts[:self.FIRST_PAGE])
+        self.assertTrue(page_obj.has_next())
+        self.assertFalse(page_obj.has_previous())
+
+    def test_keyset_page_skips_count(self):
+        """Курсорная страница обходится одним запросом без COUNT."""
+        cursor = KeysetPaginatorTest.posts[self.FIRST_PAGE - 1].cursor
+        with self.assertNumQueries(1):
+            self.unathorized_client.get(
+                reverse('posts:index'), {'after': cursor})
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.unathorized_client.get(
+            reverse('posts:index'), {'after': 'garbage'})
+        self.assertEqual(list(response.context['page_obj']),
+                         KeysetPaginatorTest.posts[:self.FIRST_PAGE])
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',
+            group=cls.group,)
+
+    def setUp(self):
+        cache.clear()
+        # Авторизованному клиенту страница целиком не кэшируется.
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_index(self):
+        return self.authorized_client.get(
+            reverse('posts:index')).content.decode()
+
+    def test_card_is_served_from_cache(self):
+        """Карточка берётся из кэша, пока пост не сохранён заново."""
+        self.get_index()
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка поста')
+        self.assertNotIn('Тихая правка поста', self.get_index())
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        self.assertIn('Тихая правка поста', self.get_index())
+
+    def test_group_and_author_changes_invalidate_cards(self):
+        """Изменение группы или автора сбрасывает карточки их постов."""
+        self.get_index()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Переименованная группа'
+        group.save()
+        self.assertIn('Переименованная группа', self.get_index())
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Лев'
+        user.last_name = 'Толстой'
+        user.save()
+        self.assertIn('Лев Толстой', self.get_index())
+
+    def test_cards_read_with_two_cache_calls(self):
+        """Версии и карточки страницы читаются двумя get_many на всех."""
+        for x in range(3):
+            Post.objects.create(author=self.user, text=f'{x} запись ленты',
+                                group=self.group)
+        self.get_index()
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many:
+            self.get_index()
+        self.assertEqual(get_many.call_count, 2)
+
+    def test_group_and_author_changes_skip_post_lists(self):
+        """Правка группы и автора не перебирает их посты."""
+        group = Group.objects.get(pk=self.group.pk)
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            group.save()
+            user.save()
+        self.assertFalse(any('"posts_post"' in query['sql']
+                             for query in queries.captured_queries))
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',
+            group=cls.group,)
+        cls.addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', args={cls.user.username}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_pages_served_without_queries(self):
+        """Повторный анонимный запрос обходится проверкой свежести."""
+        # Группе и профилю нужен один запрос на вычисление ETag.
+        budgets = dict(zip(AnonymousPageCacheTest.addresses, (0, 1, 1)))
+        for address, budget in budgets.items():
+            with self.subTest(address=address):
+                first = self.unathorized_client.get(address)
+                with self.assertNumQueries(budget):
+                    second = self.unathorized_client.get(address)
+                self.assertEqual(first.content, second.content)
+                self.assertIn('Cookie', second['Vary'])
+
+    def test_new_post_invalidates_pages(self):
+        """Новый пост сбрасывает закэшированные страницы."""
+        for address in AnonymousPageCacheTest.addresses:
+            self.unathorized_client.get(address)
+        Post.objects.create(
+            author=self.user,
+            text='Свежая запись после кэширования',
+            group=self.group,)
+        for address in AnonymousPageCacheTest.addresses:
+            with self.subTest(address=address):
+                response = self.unathorized_client.get(address)
+                self.assertContains(response, 'Свежая запись')
+
+    def test_authorized_user_gets_personal_page(self):
+        """Авторизованный пользователь не получает анонимную копию."""
+        for address in AnonymousPageCacheTest.addresses:
+            with self.subTest(address=address):
+                self.unathorized_client.get(address)
+                response = self.authorized_client.get(address)
+                self.assertContains(response, self.user.username)
+                self.assertIsNotNone(response.context)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Лев Толстой писал дневник во время похода на Фокшаны',)
+        cls.post2 = Post.objects.create(
+            author=cls.user,
+            text='Запись о походе без упоминания города',)
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    def search(self, query):
+        response = self.unathorized_client.get(
+            reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_matching_posts(self):
+        self.assertEqual(self.search('фокшаны'), [SearchViewTest.post])
+        self.assertEqual(self.search('дневник Толстой'),
+                         [SearchViewTest.post])
+        self.assertEqual(self.search('город'), [])
+
+    def test_search_tolerates_fts_syntax(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        for query in ('"', 'NOT', 'поход*', 'a OR (b'):
+            with self.subTest(query=query):
+                response = self.unathorized_client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при редактировании и удалении поста."""
+        post = Post.objects.get(pk=SearchViewTest.post2.pk)
+        post.text = 'Запись о Бухаресте'
+        post.save()
+        self.assertEqual(self.search('Бухаресте'), [post])
+        self.assertEqual(self.search('упоминания'), [])
+        post.delete()
+        self.assertEqual(self.search('Бухаресте'), [])
+
+    def test_rebuild_search_index_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('фокшаны'), [SearchViewTest.post])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.user2 = User.objects.create_user(username='test_name2',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',
+            group=cls.group,)
+        cls.addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', args={cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Повторный визит без изменений получает 304 без рендеринга."""
+        # Главной хватает поколения из кэша, остальным — одного запроса.
+        budgets = dict(zip(ConditionalGetTest.addresses, (0, 1, 1, 1)))
+        for address, budget in budgets.items():
+            with self.subTest(address=address):
+                etag = self.unathorized_client.get(address)['ETag']
+                with self.assertNumQueries(budget):
+                    response = self.unathorized_client.get(
+                        address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_post_edit_changes_etag(self):
+        """Правка поста через post_edit меняет ETag страниц."""
+        etags = {
+            address: self.unathorized_client.get(address)['ETag']
+            for address in ConditionalGetTest.addresses
+        }
+        self.authorized_client.post(
+            reverse('posts:post_edit',
+                    kwargs={'post_id': ConditionalGetTest.post.id}),
+            data={'text': 'Отредактированная тестовая запись'},
+        )
+        for address, etag in etags.items():
+            with self.subTest(address=address):
+                response = self.unathorized_client.get(
+                    address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_user(self):
+        """Анонимная и персональная версии страницы не смешиваются."""
+        for address in ConditionalGetTest.addresses:
+            with self.subTest(address=address):
+                etag = self.unathorized_client.get(address)['ETag']
+                response = self.authorized_client.get(
+                    address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_ignores_if_modified_since(self):
+        """Новый пост автора меняет страницу поста, хотя сам пост тот же."""
+        address = reverse('posts:post_detail',
+                          kwargs={'post_id': ConditionalGetTest.post.id})
+        response = self.unathorized_client.get(address)
+        self.assertFalse(response.has_header('Last-Modified'))
+        Post.objects.create(author=self.user, text='Ещё одна запись')
+        response = self.unathorized_client.get(
+            address, HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2099 00:00:00 GMT')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, '2</span>')
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title=('Заголовок для тестовой группы'),
+            slug='test_slug',
+            description="Тестовое описание",)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',
+            group=cls.group,)
+        cls.feeds = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=[cls.group.slug]):
+                'application/rss+xml',
+            reverse('posts:group_atom', args=[cls.group.slug]):
+                'application/atom+xml',
+            reverse('posts:profile_rss', args=[cls.user.username]):
+                'application/rss+xml',
+            reverse('posts:profile_atom', args=[cls.user.username]):
+                'application/atom+xml',
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    def test_feeds_list_posts(self):
+        """Ленты отдают посты в своём формате."""
+        for address, content_type in FeedsTest.feeds.items():
+            with self.subTest(address=address):
+                response = self.unathorized_client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(
+                    response['Content-Type'].startswith(content_type))
+                self.assertContains(response, FeedsTest.post.excerpt)
+        response = self.unathorized_client.get(
+            reverse('posts:group_rss', args=['missing']))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_polling_costs_cache_lookup(self):
+        """Опрос без изменений не рендерит ленту заново."""
+        # Главной хватает поколения из кэша, остальным — одного запроса.
+        budgets = dict(zip(FeedsTest.feeds, (0, 0, 1, 1, 1, 1)))
+        for address, budget in budgets.items():
+            with self.subTest(address=address):
+                etag = self.unathorized_client.get(address)['ETag']
+                with self.assertNumQueries(budget):
+                    response = self.unathorized_client.get(
+                        address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                with self.assertNumQueries(budget):
+                    response = self.unathorized_client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_post_refreshes_feeds(self):
+        """Новый пост сразу попадает во все свои ленты."""
+        for address in FeedsTest.feeds:
+            self.unathorized_client.get(address)
+        post = Post.objects.create(
+            author=FeedsTest.user,
+            text='Самая свежая запись',
+            group=FeedsTest.group,)
+        for address in FeedsTest.feeds:
+            with self.subTest(address=address):
+                response = self.unathorized_client.get(address)
+                self.assertContains(response, post.excerpt)
+
+
+class GroupIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {x}',
+                slug=f'test_slug{x}',
+                description='Тестовое описание',)
+            for x in range(3)
+        ]
+        for x, group in enumerate(cls.groups):
+            for _ in range(x + 1):
+                Post.objects.create(
+                    author=cls.user,
+                    text='Тестовая запись',
+                    group=group,)
+        # Первая группа самая активная, хотя записей в ней меньше всех.
+        Post.objects.create(
+            author=cls.user, text='Свежая запись', group=cls.groups[0])
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    def get_slugs(self, **params):
+        response = self.unathorized_client.get(
+            reverse('posts:group_index'), params)
+        return [group.slug for group in response.context['page_obj']]
+
+    def test_sorting(self):
+        """Каталог групп сортируется по активности, числу записей, названию.
+        """
+        self.assertEqual(self.get_slugs(),
+                         ['test_slug0', 'test_slug2', 'test_slug1'])
+        self.assertEqual(self.get_slugs(sort='posts'),
+                         ['test_slug2', 'test_slug0', 'test_slug1'])
+        self.assertEqual(self.get_slugs(sort='title'),
+                         ['test_slug0', 'test_slug1', 'test_slug2'])
+
+    def test_counts_come_from_counters(self):
+        """Счётчики берутся из групп, без запроса на каждую группу."""
+        address = reverse('posts:group_index')
+        with self.assertNumQueries(2):
+            response = self.unathorized_client.get(address)
+        self.assertContains(response, 'Записей: 3')
+        with self.assertNumQueries(0):
+            self.unathorized_client.get(address)
+
+    def test_cache_refreshes_on_new_post(self):
+        """Новый пост в группе обновляет закэшированный каталог."""
+        address = reverse('posts:group_index')
+        self.unathorized_client.get(address)
+        Post.objects.create(
+            author=GroupIndexTest.user,
+            text='Ещё одна запись',
+            group=GroupIndexTest.groups[1],)
+        response = self.unathorized_client.get(address)
+        self.assertContains(response, 'Записей: 3', count=2)
+
+    def test_activity_follows_latest_post(self):
+        """Удаление самой свежей записи возвращает группе прежнюю дату."""
+        group = GroupIndexTest.groups[0]
+        latest = group.posts.latest('pub_date')
+        latest.delete()
+        group.refresh_from_db()
+        self.assertEqual(group.last_pub_date,
+                         group.posts.latest('pub_date').pub_date)
+        self.assertEqual(self.get_slugs(),
+                         ['test_slug2', 'test_slug1', 'test_slug0'])
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader',)
+        cls.author = User.objects.create_user(username='author',)
+        cls.star = User.objects.create_user(username='star',)
+        cls.stranger = User.objects.create_user(username='stranger',)
+        for x in range(3):
+            Post.objects.create(author=cls.author, text=f'{x} запись автора')
+            Post.objects.create(author=cls.star, text=f'{x} запись звезды')
+            Post.objects.create(author=cls.stranger, text=f'{x} чужая')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self, author):
+        return self.reader_client.post(
+            reverse('posts:profile_follow', args=[author.username]))
+
+    def get_feed(self, **params):
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), params)
+        return response.context['page_obj']
+
+    def test_anonymous_profile_shows_new_followers(self):
+        """Подписка обновляет закэшированный профиль и его ETag."""
+        client = Client()
+        address = reverse('posts:profile', args=[self.author.username])
+        etag = client.get(address)['ETag']
+        self.follow(self.author)
+        response = client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Подписчиков: 1')
+        self.reader_client.post(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertContains(client.get(address), 'Подписчиков: 0')
+
+    def test_follow_and_unfollow(self):
+        """Подписка заполняет ленту, отписка её очищает."""
+        self.follow(self.author)
+        self.follow(self.author)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.author).followers_count, 1)
+        self.assertEqual(
+            list(self.get_feed()),
+            list(Post.objects.filter(author=self.author)))
+        self.reader_client.post(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertEqual(list(self.get_feed()), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост автора попадает в ленты подписчиков при записи."""
+        self.follow(self.author)
+        post = Post.objects.create(author=self.author, text='Свежая запись')
+        self.assertTrue(TimelineEntry.objects.filter(
+            owner=self.reader, post=post).exists())
+        with self.assertNumQueries(5):
+            # Сессия, пользователь, популярные авторы, лента и посты.
+            page_obj = self.get_feed()
+        self.assertEqual(page_obj[0], post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_merged_on_read(self):
+        """Посты популярных авторов подмешиваются при чтении."""
+        Follow.objects.create(user=self.stranger, author=self.star)
+        self.follow(self.author)
+        self.follow(self.star)
+        for x in range(8):
+            Post.objects.create(author=self.star, text=f'{x} новая запись')
+        self.assertFalse(TimelineEntry.objects.filter(
+            owner=self.reader, author=self.star).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            author=self.author).exists())
+        expected = list(Post.objects.filter(
+            author__in=[self.author, self.star]))
+        page_obj = self.get_feed()
+        self.assertEqual(list(page_obj), expected[:10])
+        older = self.get_feed(after=page_obj.next_cursor)
+        self.assertEqual(list(older), expected[10:])
+        self.assertFalse(older.has_next())
+        newer = self.get_feed(before=older.previous_cursor)
+        self.assertEqual(list(newer), expected[:10])
+
+    def test_rebuild_timelines_command(self):
+        """Команда чинит ленты по подпискам."""
+        self.follow(self.author)
+        TimelineEntry.objects.all().delete()
+        Follow.objects.create(user=self.stranger, author=self.author)
+        TimelineEntry.objects.create(
+            owner=self.stranger, post=Post.objects.filter(
+                author=self.star).first(),
+            author=self.star, pub_date=timezone.now())
+        call_command('rebuild_timelines', stdout=StringIO())
+        for user in (self.reader, self.stranger):
+            self.assertEqual(
+                set(TimelineEntry.objects.filter(owner=user).values_list(
+                    'post_id', flat=True)),
+                set(Post.objects.filter(author=self.author).values_list(
+                    'pk', flat=True)))
+
+
+class PostDetailCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',)
+
+    def setUp(self):
+        cache.clear()
+        post_details.clear()
+        self.unathorized_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.address = reverse('posts:post_detail',
+                               kwargs={'post_id': self.post.id})
+
+    def test_hot_post_skips_database(self):
+        """Повторный показ поста берёт его из памяти процесса."""
+        self.unathorized_client.get(self.address)
+        hits = post_details.stats()['hits']
+        with self.assertNumQueries(1):
+            # Остаётся только проверка версии для ETag.
+            response = self.unathorized_client.get(self.address)
+        self.assertEqual(response.context['post'], self.post)
+        self.assertEqual(post_details.stats()['hits'], hits + 1)
+
+    def test_edit_and_delete_invalidate(self):
+        """Правка и удаление поста сбрасывают кэш."""
+        self.unathorized_client.get(self.address)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Отредактированная тестовая запись'},
+        )
+        response = self.unathorized_client.get(self.address)
+        self.assertContains(response, 'Отредактированная тестовая запись')
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(post_details.stats()['entries'], 0)
+        response = self.unathorized_client.get(self.address)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class LookupCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_name1',)
+        cls.group = Group.objects.create(
+            title='Заголовок для тестовой группы',
+            slug='test_slug',
+            description='Тестовое описание',)
+        Post.objects.create(
+            author=cls.user,
+            text='Тестовая запись для создания нового поста',
+            group=cls.group,)
+
+    def setUp(self):
+        cache.clear()
+        self.unathorized_client = Client()
+
+    def test_unknown_addresses_are_cheap_404(self):
+        """Несуществующие группа и автор отдают 404, повтор без БД."""
+        addresses = (
+            reverse('posts:group_list', kwargs={'slug': 'no_such_slug'}),
+            reverse('posts:group_rss', kwargs={'slug': 'no_such_slug'}),
+            reverse('posts:profile', args=['no_such_user']),
+            reverse('posts:profile_atom', args=['no_such_user']),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.unathorized_client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                with self.assertNumQueries(0):
+                    response = self.unathorized_client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_warm_lookup_saves_query(self):
+        """Повторный показ группы и профиля не ищет их по адресу."""
+        addresses = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                with self.assertNumQueries(3):
+                    self.unathorized_client.get(address)
+                with self.assertNumQueries(2):
+                    response = self.unathorized_client.get(
+                        address + '?page=1')
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['author'], self.user)
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_changes_invalidate_lookups(self):
+        """Создание и переименование сбрасывают закэшированный ответ."""
+        new_address = reverse('posts:group_list', kwargs={'slug': 'new_slug'})
+        self.assertEqual(self.unathorized_client.get(
+            new_address).status_code, HTTPStatus.NOT_FOUND)
+        group = Group.objects.create(
+            title='Новая группа', slug='new_slug', description='Описание')
+        self.assertEqual(self.unathorized_client.get(
+            new_address).status_code, HTTPStatus.OK)
+        group.slug = 'renamed_slug'
+        group.save()
+        self.assertEqual(self.unathorized_client.get(
+            new_address).status_code, HTTPStatus.NOT_FOUND)
+
+        address = reverse('posts:profile', args=[self.user.username])
+        self.unathorized_client.get(address)
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed_user'
+        user.save()
+        self.assertEqual(self.unathorized_client.get(
+            address).status_code, HTTPStatus.NOT_FOUND)
+        response = self.unathorized_client.get(
+            reverse('posts:profile', args=['renamed_user']))
+        self.assertEqual(response.context['author'].username, 'renamed_user')
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .utils import LIMIT_POSTS, KeysetPage, keyset_slice, parse_cursor
+
+# Сколько подписчиков может быть у автора, чтобы его посты ещё
+# раскладывались по лентам при публикации. Посты авторов популярнее
+# подмешиваются в ленту при чтении (fan-out on read).
+DEFAULT_FANOUT_LIMIT: int = 1000
+# Сколько последних постов кладётся в ленту при подписке и починке.
+TIMELINE_LENGTH: int = 500
+BATCH_SIZE: int = 1000
+
+
+def fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', DEFAULT_FANOUT_LIMIT)
+
+
+def is_celebrity(author_id):
+    followers = AuthorStats.objects.filter(author_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    return (followers or 0) > fanout_limit()
+
+
+def celebrity_ids(user_id):
+    """Авторы из подписок пользователя, чьи посты читаются при запросе."""
+    return list(Follow.objects.filter(
+        user_id=user_id,
+        author__stats__followers_count__gt=fanout_limit(),
+    ).values_list('author_id', flat=True))
+
+
+def insert_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """Раскладывает новые посты по лентам подписчиков их авторов.
+
+    Годится и для массовых вставок в обход сигналов: популярные авторы
+    и подписчики остальных читаются двумя запросами на всю пачку.
+    """
+    author_ids = {post.author_id for post in posts}
+    celebrities = set(AuthorStats.objects.filter(
+        author_id__in=author_ids, followers_count__gt=fanout_limit(),
+    ).values_list('author_id', flat=True))
+    followers = defaultdict(list)
+    for owner_id, author_id in Follow.objects.filter(
+            author_id__in=author_ids - celebrities).values_list(
+                'user_id', 'author_id').iterator():
+        followers[author_id].append(owner_id)
+    insert_entries(
+        TimelineEntry(owner_id=owner_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for post in posts
+        for owner_id in followers.get(post.author_id, ())
+    )
+
+
+def fill_timeline(user_id, author_ids, length=TIMELINE_LENGTH):
+    """Кладёт в ленту пользователя последние посты перечисленных авторов."""
+    if not author_ids:
+        return
+    rows = Post.objects.filter(author_id__in=author_ids).values_list(
+        'pk', 'author_id', 'pub_date')[:length]
+    insert_entries(
+        TimelineEntry(owner_id=user_id, post_id=pk, author_id=author_id,
+                      pub_date=pub_date)
+        for pk, author_id, pub_date in rows
+    )
+
+
+def drop_author(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(owner_id=user_id, author_id=author_id)\
+        .delete()
+
+
+def rebuild_timeline(user_id, length=TIMELINE_LENGTH):
+    """Собирает ленту пользователя заново по его подпискам."""
+    TimelineEntry.objects.filter(owner_id=user_id).delete()
+    celebrities = set(celebrity_ids(user_id))
+    author_ids = [
+        author_id for author_id in Follow.objects.filter(
+            user_id=user_id).values_list('author_id', flat=True)
+        if author_id not in celebrities
+    ]
+    fill_timeline(user_id, author_ids, length)
+
+
+def timeline_page(request, user, limit=LIMIT_POSTS):
+    """Страница ленты подписок по курсору ?after= или ?before=.
+
+    Разложенные посты читаются из TimelineEntry по индексу владельца,
+    посты популярных авторов — из их собственных лент; обе выборки
+    ограничены limit + 1 строками и сливаются по (pub_date, id).
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    keys, has_more = keyset_slice(
+        TimelineEntry.objects.filter(owner=user).values_list(
+            'pub_date', 'post_id'),
+        after=after, before=before, limit=limit, id_field='post_id')
+    celebrities = celebrity_ids(user.pk)
+    if celebrities:
+        extra, extra_more = keyset_slice(
+            Post.objects.filter(author_id__in=celebrities).values_list(
+                'pub_date', 'id'),
+            after=after, before=before, limit=limit)
+        # Пост мог попасть в ленту до того, как автор стал популярным.
+        keys = sorted(set(keys) | set(extra), reverse=True)
+        has_more = has_more or extra_more or len(keys) > limit
+    backwards = parse_cursor(before) is not None
+    keys = keys[-limit:] if backwards else keys[:limit]
+    posts = Post.objects.select_related('author', 'group').defer(
+        'text').in_bulk([pk for _, pk in keys])
+    posts = [posts[pk] for _, pk in keys if pk in posts]
+    if backwards:
+        return KeysetPage(posts, has_next=True, has_previous=has_more)
+    return KeysetPage(posts, has_next=has_more,
+                      has_previous=parse_cursor(after) is not None)
@@ -1,9 +1,181 @@
-from django.core.paginator import Paginator
+import datetime
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 LIMIT_POSTS: int = 10
+# Приблизительные счётчики лент живут минуту: страницы не пересчитывают
+# COUNT(*) на каждый запрос, а ошибка ограничена новыми постами за минуту.
+COUNT_TIMEOUT: int = 60
+ELLIPSIS = '…'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_cursor(pub_date, pk):
+    """Курсор ленты: микросекунды с начала эпохи и id поста."""
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, datetime.timezone.utc)
+    micros = (pub_date - EPOCH) // datetime.timedelta(microseconds=1)
+    return f'{micros}_{pk}'
+
+
+def parse_cursor(cursor):
+    """Разбирает курсор, для некорректного значения возвращает None."""
+    try:
+        micros, pk = cursor.split('_')
+        pub_date = EPOCH + datetime.timedelta(microseconds=int(micros))
+        return pub_date, int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_slice(queryset, after=None, before=None, limit=LIMIT_POSTS,
+                 id_field='id'):
+    """Выбирает limit записей старше курсора after или новее before.
+
+    Возвращает (записи, есть_ещё) — записи всегда от новых к старым.
+    Запрос опирается только на сравнение по (pub_date, id_field),
+    поэтому цена любой страницы одинакова и не зависит от её глубины.
+    """
+    key = parse_cursor(before)
+    if key is not None:
+        pub_date, pk = key
+        rows = list(queryset.filter(
+            Q(pub_date__gt=pub_date)
+            | Q(pub_date=pub_date, **{f'{id_field}__gt': pk})
+        ).order_by('pub_date', id_field)[:limit + 1])
+        return rows[:limit][::-1], len(rows) > limit
+    key = parse_cursor(after)
+    if key is not None:
+        pub_date, pk = key
+        queryset = queryset.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, **{f'{id_field}__lt': pk}))
+    rows = list(queryset.order_by('-pub_date', f'-{id_field}')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+class KeysetPage:
+    """Страница ленты, выбранная по курсору без COUNT и OFFSET."""
+    is_keyset: bool = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        return self.object_list[-1].cursor
+
+    @property
+    def previous_cursor(self):
+        return self.object_list[0].cursor
+
+
+def keyset_paginator(request, post_list):
+    """Курсорная пагинация по параметрам ?after= и ?before=."""
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    posts, has_more = keyset_slice(post_list, after=after, before=before)
+    if parse_cursor(before) is not None:
+        return KeysetPage(posts, has_next=True, has_previous=has_more)
+    return KeysetPage(
+        posts,
+        has_next=has_more,
+        has_previous=parse_cursor(after) is not None,
+    )
+
+
+def cached_count(queryset, name, timeout=COUNT_TIMEOUT):
+    """COUNT(*) выборки, закэшированный под именем name."""
+    digest = hashlib.md5(name.encode()).hexdigest()
+    key = f'posts:count:{digest}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class WindowedPage(Page):
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(self.number)
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор, который берёт число записей из count, а не из COUNT(*).
+
+    count — число или функция без аргументов: её вызовут, только когда
+    число понадобится. Ссылки на страницы рисуются окном вокруг текущей.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is None:
+            return super().count
+        if callable(self.known_count):
+            return self.known_count()
+        return self.known_count
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг number и по краям, пропуски — ELLIPSIS."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
 
+def post_paginator(request, post_list, count=None):
+    """Страница ленты: по курсору или по номеру.
 
-def post_paginator(request, post_list):
-    paginator = Paginator(post_list, LIMIT_POSTS)
+    count передаётся в CountedPaginator; курсорные страницы его
+    не используют вовсе.
+    """
+    if 'after' in request.GET or 'before' in request.GET:
+        return keyset_paginator(request, post_list)
+    paginator = CountedPaginator(post_list, LIMIT_POSTS, count=count)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -1,61 +1,169 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import (Http404, HttpResponseBadRequest,
+                         StreamingHttpResponse)
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_POST
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
-from .utils import post_paginator
+from core.db import retry_on_locked
+from core.routers import replica_reads
+from .cache import (PROFILES, cache_anonymous_page, get_generation,
+                    get_post_detail, render_cards)
+from .conditional import (group_etag, group_state, index_etag, post_etag,
+                          post_state, profile_etag, profile_state)
+from .search import search_posts
+from .timeline import timeline_page
+from .utils import (LIMIT_POSTS, CountedPaginator, cached_count,
+                    post_paginator)
+from .export import (CONTENT_TYPES, EXPORT_FORMATS, export_lines,
+                     export_queryset, parse_moment)
 from .forms import PostForm
-from .models import Post, Group, User
+from .models import Follow, Post, Group, User
 
 
+@replica_reads
+@condition(etag_func=index_etag)
+@cache_anonymous_page
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = post_paginator(request, post_list)
+    post_list = Post.objects.select_related(
+        'author', 'group').defer('text')
+    page_obj = post_paginator(
+        request, post_list,
+        count=lambda: cached_count(Post.objects.all(), 'index'))
     text = 'Главная страница'
     context = {
         'text': text,
         'page_obj': page_obj,
+        'cards': render_cards(page_obj, 'index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@condition(etag_func=group_etag)
+@cache_anonymous_page
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    state = group_state(request, slug)
+    if state is None:
+        raise Http404('Группа не найдена')
+    group, (posts_count, _) = state
+    group.posts_count = posts_count
+    post_list = group.posts.select_related('author', 'group').defer('text')
     title = group.title
-    page_obj = post_paginator(request, post_list)
+    page_obj = post_paginator(
+        request, post_list, count=lambda: group.posts_count)
     context = {
         'group': group,
         'title': title,
         'page_obj': page_obj,
+        'cards': render_cards(page_obj, 'group'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
+@condition(etag_func=profile_etag)
+@cache_anonymous_page
 def profile(request, username):
-    author = User.objects.get(username=username)
-    post_list = author.posts.all()
-    page_obj = post_paginator(request, post_list)
+    state = profile_state(request, username)
+    if state is None:
+        raise Http404('Пользователь не найден')
+    author, (posts_count, _, followers_count) = state
+    post_list = author.posts.select_related(
+        'author', 'group').defer('text')
+    page_obj = post_paginator(
+        request, post_list, count=lambda: posts_count or 0)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author).exists()
     context = {
         'author': author,
+        'following': following,
+        'posts_count': posts_count or 0,
+        'followers_count': followers_count or 0,
         'page_obj': page_obj,
+        'cards': render_cards(page_obj, 'profile'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+GROUPS_PER_PAGE: int = 50
+# Порядки каталога групп; активность — дата последней записи группы
+# из хранимого счётчика last_pub_date.
+GROUP_ORDERINGS = {
+    'activity': (F('last_pub_date').desc(nulls_last=True), 'id'),
+    'posts': ('-posts_count', 'id'),
+    'title': ('title', 'id'),
+}
+
+
+@condition(etag_func=index_etag)
+@cache_anonymous_page
+def group_index(request):
+    sort = request.GET.get('sort')
+    if sort not in GROUP_ORDERINGS:
+        sort = 'activity'
+    group_list = Group.objects.order_by(*GROUP_ORDERINGS[sort])
+    paginator = CountedPaginator(
+        group_list, GROUPS_PER_PAGE,
+        count=lambda: cached_count(Group.objects.all(), 'groups'))
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'sort': sort,
+        'query_prefix': urlencode({'sort': sort}) + '&',
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/groups.html', context)
+
+
+@cache_anonymous_page
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_list = search_posts(
+        Post.objects.select_related('author', 'group').defer('text'), query)
+    # Выдача упорядочена по релевантности, курсор по дате к ней не подходит.
+    paginator = CountedPaginator(
+        post_list, LIMIT_POSTS,
+        count=lambda: cached_count(post_list, f'search:{query}'))
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'query_prefix': urlencode({'q': query}) + '&',
+        'page_obj': page_obj,
+        'cards': render_cards(page_obj, 'index'),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@replica_reads
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = Post.objects.get(id=post_id)
+    state = post_state(request, post_id)
+    if state is None:
+        raise Http404('Пост не найден.')
+    post = get_post_detail(
+        post_id, (*state, get_generation(PROFILES)),
+        lambda: Post.objects.using(DEFAULT_DB_ALIAS).select_related(
+            'author__stats', 'group').get(id=post_id))
     context = {
         'post': post,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@retry_on_locked
+def create_post(author, data):
+    # Новый объект на каждую попытку: после отката у прежнего остался бы id.
+    return Post.objects.create(author=author, **data)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None)
     if form.is_valid():
-        form = form.save(commit=False)
-        form.author = request.user
-        form.save()
+        create_post(request.user, form.cleaned_data)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/post_create.html',
                   {'form': form, })
@@ -70,7 +178,54 @@ def post_edit(request, post_id):
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
     if form.is_valid():
-        post.save()
+        retry_on_locked(post.save)()
         return redirect('posts:post_detail', post_id)
     return render(request, template, {"form": form,
                   'post': post, 'is_edit': is_edit, })
+
+
+@login_required
+def follow_index(request):
+    page_obj = timeline_page(request, request.user)
+    context = {
+        'page_obj': page_obj,
+        'cards': render_cards(page_obj, 'index'),
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+@require_POST
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        retry_on_locked(Follow.objects.get_or_create)(
+            user=request.user, author=author)
+    return redirect('posts:profile', username)
+
+
+@login_required
+@require_POST
+def profile_unfollow(request, username):
+    retry_on_locked(Follow.objects.filter(
+        user=request.user, author__username=username).delete)()
+    return redirect('posts:profile', username)
+
+
+@staff_member_required
+def export(request):
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки.')
+    try:
+        since, until = (
+            parse_moment(request.GET[name]) if request.GET.get(name) else None
+            for name in ('since', 'until')
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    queryset = export_queryset(since, until, request.GET.get('group'))
+    response = StreamingHttpResponse(
+        export_lines(queryset, fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="posts.{fmt}"'
+    return response
@@ -49,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.performance.PerformanceMiddleware',
+    'core.middleware.slow_queries.SlowQueryMiddleware',
+    'core.middleware.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,9 +91,61 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами, а не открывается на каждый.
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            # Сколько секунд ждать освобождения блокировки на запись.
+            'timeout': 5,
+        },
+    }
+}
+
+# Реплика для чтения: путь к её файлу в переменной YATUBE_REPLICA_DB.
+# Для проверки на своей машине подойдёт копия db.sqlite3. В тестах
+# реплика — зеркало основной базы.
+DATABASE_REPLICAS = []
+if os.environ.get('YATUBE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['YATUBE_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи браузер читает с основной базы
+REPLICA_STICKY_SECONDS = 15
+
+# Прагмы для каждого нового соединения с SQLite (core.db): WAL, чтобы
+# читатели не ждали писателей, и кэши страниц в памяти процесса.
+# Включаются только в продакшене: YATUBE_DB_PROFILE=production.
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = (SQLITE_PRODUCTION_PRAGMAS
+                  if os.environ.get('YATUBE_DB_PROFILE') == 'production'
+                  else {})
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# В продакшене замените на общий для процессов бэкенд (memcached/redis).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube',
     }
 }
 
+# LRU горячих постов в памяти каждого процесса перед общим кэшем
+POST_DETAIL_LRU_BYTES = 16 * 1024 * 1024
+POST_DETAIL_LRU_TTL = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -115,6 +170,21 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Порог медленного SQL-запроса в мс (переменная YATUBE_SLOW_QUERY_MS);
+# без неё журнал медленных запросов выключен
+SLOW_QUERY_MS = (float(os.environ['YATUBE_SLOW_QUERY_MS'])
+                 if os.environ.get('YATUBE_SLOW_QUERY_MS') else None)
+
+
+# Авторы с числом подписчиков больше порога не раскладываются по лентам
+# подписок при публикации: их посты подмешиваются при чтении.
+# Посты, опубликованные, пока автор был выше порога, в ленты не попали:
+# если подписчиков снова стало меньше, они пропадут из лент до запуска
+# rebuild_timelines. Массовые вставки (import_posts, seed) раскладываются
+# через posts.bulk.create_posts.
+TIMELINE_FANOUT_LIMIT = 1000
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 